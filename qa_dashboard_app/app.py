@@ -5,8 +5,28 @@ import os
 import sys
 import argparse
 import subprocess
+import threading
 from pathlib import Path
 
+APP_DIR = Path(__file__).resolve().parent
+
+def _enter_app_dir():
+    # The scheduler and the dashboard run in this process and use paths
+    # relative to the app directory
+    os.chdir(APP_DIR)
+    sys.path.append(str(APP_DIR / 'src'))
+
+def _run_streamlit():
+    # Streamlit's own command line, without starting a second interpreter;
+    # returns once the server is stopped (Ctrl+C)
+    from streamlit.web import cli as streamlit_cli
+    streamlit_cli.main([
+        "run", "dashboard.py",
+        "--server.port", "8501",
+        "--server.address", "localhost",
+        "--browser.gatherUsageStats", "false"
+    ], standalone_mode=False)
+
 def run_dashboard():
     """Executa o dashboard Streamlit"""
     print("Iniciando QA Dashboard...")
@@ -14,51 +34,108 @@ def run_dashboard():
     print("Pressione Ctrl+C para parar o aplicativo.")
     
     try:
-        # Change to the app directory
-        app_dir = Path(__file__).parent
-        os.chdir(app_dir)
-        
-        # Run Streamlit
-        subprocess.run([
-            sys.executable, "-m", "streamlit", "run", "dashboard.py",
-            "--server.port", "8501",
-            "--server.address", "localhost",
-            "--browser.gatherUsageStats", "false"
-        ])
+        _enter_app_dir()
+        _run_streamlit()
     except KeyboardInterrupt:
         print("\nAplicativo encerrado pelo usuário.")
     except Exception as e:
         print(f"Erro ao executar o dashboard: {e}")
-def run_scheduler():
+
+def run_scheduler(scheduler_args):
     """Executa o agendador de processamento automático"""
     print("Iniciando agendador de processamento automático...")
     
     try:
-        # Change to the app directory
-        app_dir = Path(__file__).parent
-        os.chdir(app_dir)
+        _enter_app_dir()
+        from scheduler import main as scheduler_main
         
-        # Run scheduler
-        subprocess.run([sys.executable, "scheduler.py"])
+        # Runs in this process, passing along the scheduler's own options
+        scheduler_main(scheduler_args, prog="app.py scheduler")
     except KeyboardInterrupt:
         print("\nAgendador encerrado pelo usuário.")
     except Exception as e:
         print(f"Erro ao executar o agendador: {e}")
 
-def test_scheduler():
+def test_scheduler(scheduler_args):
     """Testa o processamento de PDFs"""
     print("Testando processamento de PDFs...")
     
     try:
-        # Change to the app directory
-        app_dir = Path(__file__).parent
-        os.chdir(app_dir)
+        _enter_app_dir()
+        from scheduler import main as scheduler_main
         
         # Run scheduler in test mode
-        subprocess.run([sys.executable, "scheduler.py", "--test"])
+        scheduler_main(["--test"] + scheduler_args, prog="app.py test")
     except Exception as e:
         print(f"Erro ao testar o processamento: {e}")
 
+def run_combined(serve_args):
+    """Executa o dashboard e o monitoramento da pasta de entrada em um só processo"""
+    print("Iniciando QA Dashboard com o monitoramento de input_pdfs/...")
+    print("Pressione Ctrl+C para parar o aplicativo.")
+    
+    try:
+        _enter_app_dir()
+        import services
+        from scheduler import build_parser, create_scheduler
+        
+        args = build_parser(prog="app.py serve", combined=True).parse_args(serve_args)
+        # The scheduler uses the dashboard's extraction cache, strategy and
+        # process pool (fetched per batch, as it is replaced when a worker
+        # crashes), and every report it stores refreshes the trends
+        scheduler = create_scheduler(
+            args,
+            cache=services.get_extraction_cache(),
+            strategy=services.get_extraction_strategy(),
+            get_executor=services.get_worker_pool,
+            on_report_saved=services.report_saved
+        )
+    except Exception as e:
+        print(f"Erro ao iniciar o agendador: {e}")
+        return
+    
+    watcher_thread = threading.Thread(target=scheduler.watch, name="qa-scheduler", daemon=True)
+    watcher_thread.start()
+    try:
+        _run_streamlit()
+    except KeyboardInterrupt:
+        print("\nAplicativo encerrado pelo usuário.")
+    except Exception as e:
+        print(f"Erro ao executar o dashboard: {e}")
+    finally:
+        # The batch in progress is finished, so no job is left running
+        print("Aguardando o processamento em andamento terminar...")
+        scheduler.stop()
+        watcher_thread.join()
+        services.shutdown_worker_pool()
+
+def run_benchmark(benchmark_args):
+    """Mede o desempenho da extração e do processamento"""
+    print("Executando benchmark da extração de PDFs...")
+    
+    try:
+        # Change to the app directory
+        app_dir = Path(__file__).parent
+        os.chdir(app_dir)
+        
+        # Run benchmark, passing along its own options
+        result = subprocess.run([sys.executable, "benchmark.py"] + benchmark_args)
+        sys.exit(result.returncode)
+    except KeyboardInterrupt:
+        print("\nBenchmark interrompido pelo usuário.")
+
+def run_extract(extract_args):
+    """Extrai KPIs de vários PDFs de uma vez, sem agendador nem dashboard"""
+    # Runs in this process; results go to stdout or a file, messages to stderr
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+    from batch_extract import main as extract_main
+    
+    try:
+        sys.exit(extract_main(extract_args))
+    except KeyboardInterrupt:
+        print("\nExtração interrompida pelo usuário.", file=sys.stderr)
+        sys.exit(130)
+
 def show_help():
     """Mostra informações de ajuda"""
     help_text = """
@@ -67,18 +144,26 @@ QA Dashboard App - Aplicativo para análise de métricas de QA
 COMANDOS DISPONÍVEIS:
   dashboard    - Inicia o dashboard interativo (padrão)
   scheduler    - Inicia o agendador de processamento automático
+  serve        - Dashboard e monitoramento de input_pdfs/ em um só processo
   test         - Testa o processamento de PDFs
+  benchmark    - Mede tempo e memória de cada etapa da extração
+  extract      - Extrai os KPIs de vários PDFs (JSON Lines, CSV ou Parquet)
   help         - Mostra esta ajuda
 
 EXEMPLOS DE USO:
   python app.py                    # Inicia o dashboard
   python app.py dashboard          # Inicia o dashboard
   python app.py scheduler          # Inicia o agendador
+  python app.py scheduler --watch  # Processa PDFs assim que chegam
+  python app.py serve --prescan    # Dashboard + agendador no mesmo processo
   python app.py test               # Testa o processamento
+  python app.py benchmark --pages 50 --baseline base.json
+  python app.py extract relatorios/ --jobs 4 -o kpis.csv
+  python app.py extract "relatorios/**/*.pdf" > kpis.jsonl
 
 ESTRUTURA DE PASTAS:
   input_pdfs/          - Coloque os PDFs aqui para processamento automático
-  processed_data/      - CSVs processados são salvos aqui
+  processed_data/      - Histórico de métricas (qa_metrics.db) é salvo aqui
   input_pdfs/processed/- PDFs processados são movidos para aqui
 
 FUNCIONALIDADES:
@@ -101,18 +186,27 @@ def main():
         'command', 
         nargs='?', 
         default='dashboard',
-        choices=['dashboard', 'scheduler', 'test', 'help'],
+        choices=['dashboard', 'scheduler', 'serve', 'test', 'benchmark', 'extract', 'help'],
         help='Comando a ser executado'
     )
     
-    args = parser.parse_args()
+    # Extra options are forwarded to the command (e.g. the scheduler's own)
+    args, extra_args = parser.parse_known_args()
+    if extra_args and args.command not in ('scheduler', 'serve', 'test', 'benchmark', 'extract'):
+        parser.error(f"argumentos não reconhecidos: {' '.join(extra_args)}")
     
     if args.command == 'dashboard':
         run_dashboard()
     elif args.command == 'scheduler':
-        run_scheduler()
+        run_scheduler(extra_args)
+    elif args.command == 'serve':
+        run_combined(extra_args)
     elif args.command == 'test':
-        test_scheduler()
+        test_scheduler(extra_args)
+    elif args.command == 'benchmark':
+        run_benchmark(extra_args)
+    elif args.command == 'extract':
+        run_extract(extra_args)
     elif args.command == 'help':
         show_help()
 
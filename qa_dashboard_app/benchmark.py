@@ -0,0 +1,157 @@
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Add the src directory to the path so we can import our modules
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from instrumentation import peak_rss_mb
+from synthetic_report import generate_report
+
+STAGES = ["text", "tables", "ocr", "process"]
+
+def _cpu_seconds():
+    # Includes finished child processes, e.g. the tesseract calls of the OCR stage
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def _run_stage(stage, pdf_path, extracted_data, parallel, workers):
+    """Runs one stage and measures it. Called in a fresh process per run, so
+    the peak RSS belongs to this stage alone."""
+    from data_processor import process_extracted_data
+    from pdf_extractor import extract_tables_from_pdf, extract_text_from_pdf, ocr_pdf
+
+    stages = {
+        "text": lambda: extract_text_from_pdf(pdf_path),
+        "tables": lambda: extract_tables_from_pdf(pdf_path, parallel=parallel, workers=workers),
+        "ocr": lambda: ocr_pdf(pdf_path, workers=workers),
+        "process": lambda: process_extracted_data(extracted_data)
+    }
+    rss_before = peak_rss_mb()
+    wall_start = time.perf_counter()
+    cpu_start = _cpu_seconds()
+    result = stages[stage]()
+    measurement = {
+        "wall_seconds": time.perf_counter() - wall_start,
+        "cpu_seconds": _cpu_seconds() - cpu_start,
+        "peak_rss_mb": peak_rss_mb(),
+        "base_rss_mb": rss_before
+    }
+    if stage == "text":
+        result = str(result)
+    return measurement, result
+
+def run_benchmark(pdf_path, stages=STAGES, repeat=3, parallel=False, workers=None):
+    """Measures every stage `repeat` times and keeps the median wall and CPU
+    time and the highest peak RSS."""
+    results = {}
+    extracted_data = {"text": "", "tables": [], "ocr_text": ""}
+    outputs = {"text": "text", "tables": "tables", "ocr": "ocr_text"}
+    context = multiprocessing.get_context("spawn")
+
+    for stage in stages:
+        runs = []
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                measurement, result = executor.submit(_run_stage, stage, pdf_path, extracted_data, parallel, workers).result()
+            runs.append(measurement)
+            if stage in outputs:
+                extracted_data[outputs[stage]] = result
+        peaks = [run["peak_rss_mb"] for run in runs if run["peak_rss_mb"] is not None]
+        results[stage] = {
+            "wall_seconds": statistics.median(run["wall_seconds"] for run in runs),
+            "cpu_seconds": statistics.median(run["cpu_seconds"] for run in runs),
+            "peak_rss_mb": max(peaks) if peaks else None,
+            "base_rss_mb": runs[0]["base_rss_mb"]
+        }
+        if stage == "process":
+            df_status = result["df_status"]
+            results[stage]["status_counts"] = {str(row.Status): int(row.Total) for row in df_status.itertuples(index=False)}
+        print(f"  {stage}: {results[stage]['wall_seconds']:.3f}s")
+    return results
+
+def compare_with_baseline(results, baseline, threshold):
+    """Returns the stages whose wall time grew more than threshold (0.2 = 20%)"""
+    regressions = []
+    print("\nComparação com a linha de base:")
+    for stage, measurement in results.items():
+        previous = baseline["stages"].get(stage)
+        if not previous or not previous["wall_seconds"]:
+            continue
+        ratio = measurement["wall_seconds"] / previous["wall_seconds"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  <- REGRESSÃO"
+            regressions.append(stage)
+        print(f"  {stage:<8} {previous['wall_seconds']:>9.3f}s -> {measurement['wall_seconds']:>9.3f}s ({(ratio - 1) * 100:+.1f}%){flag}")
+    return regressions
+
+def print_results(results):
+    print(f"\n{'Etapa':<8} {'Tempo (s)':>10} {'CPU (s)':>10} {'Pico RSS (MB)':>14}")
+    for stage, measurement in results.items():
+        peak = f"{measurement['peak_rss_mb']:.1f}" if measurement["peak_rss_mb"] is not None else "n/d"
+        print(f"{stage:<8} {measurement['wall_seconds']:>10.3f} {measurement['cpu_seconds']:>10.3f} {peak:>14}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo e a memória de cada etapa da extração de PDFs de QA")
+    parser.add_argument('--pdf', help='PDF a medir; sem esta opção um relatório sintético do TestLink é gerado')
+    parser.add_argument('--pages', type=int, default=20, help='Páginas do relatório sintético')
+    parser.add_argument('--tables', type=int, default=4, help='Casos de teste (tabelas) por página')
+    parser.add_argument('--rows', type=int, default=3, help='Passos (linhas) por tabela')
+    parser.add_argument('--scanned', action='store_true', help='Gera páginas só com imagem, como um PDF escaneado')
+    parser.add_argument('--seed', type=int, default=0, help='Semente dos status sorteados')
+    parser.add_argument('--stages', default=",".join(STAGES), help='Etapas a medir, separadas por vírgula')
+    parser.add_argument('--repeat', type=int, default=3, help='Execuções por etapa (vale a mediana)')
+    parser.add_argument('--parallel', action='store_true', help='Extrai as tabelas em paralelo')
+    parser.add_argument('--workers', type=int, default=None, help='Processos/threads usados na extração')
+    parser.add_argument('--save-baseline', metavar='ARQUIVO', help='Grava os resultados como linha de base (JSON)')
+    parser.add_argument('--baseline', metavar='ARQUIVO', help='Compara com uma linha de base gravada')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Aumento de tempo tolerado antes de acusar regressão (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"etapas desconhecidas: {', '.join(unknown)} (disponíveis: {', '.join(STAGES)})")
+
+    params = {"pdf": args.pdf, "parallel": args.parallel, "workers": args.workers}
+    expected = None
+    with tempfile.TemporaryDirectory(prefix="qa_benchmark_") as temp_dir:
+        if args.pdf:
+            pdf_path = args.pdf
+        else:
+            pdf_path = os.path.join(temp_dir, "synthetic_report.pdf")
+            expected = generate_report(pdf_path, pages=args.pages, tables=args.tables, rows=args.rows, scanned=args.scanned, seed=args.seed)
+            params.update(pages=args.pages, tables=args.tables, rows=args.rows, scanned=args.scanned, seed=args.seed)
+
+        print(f"Medindo {pdf_path} ({os.path.getsize(pdf_path) / 1024:.0f} KB)...")
+        results = run_benchmark(pdf_path, stages=stages, repeat=args.repeat, parallel=args.parallel, workers=args.workers)
+
+    print_results(results)
+    if expected is not None and "tables" in results and "process" in results:
+        found = results["process"]["status_counts"]
+        expected = {status: total for status, total in expected.items() if total}
+        print(f"\nStatus esperados: {expected}")
+        print(f"Status encontrados: {found}" + ("" if found == expected else "  <- DIFERENTE"))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as file:
+            json.dump({"params": params, "stages": results}, file, indent=2)
+        print(f"\nLinha de base gravada em {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if baseline.get("params") != params:
+            print(f"\nAviso: a linha de base foi medida com outros parâmetros: {baseline.get('params')}")
+        if compare_with_baseline(results, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,23 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+import hashlib
 import os
 import sys
-
-# Importa a biblioteca de IA da Google para usar os modelos Gemini
-import google.generativeai as genai
+import time
+from concurrent.futures import as_completed
 
 # Adiciona o diretório src ao path para importar nossos módulos
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from pdf_extractor import extract_data_from_pdf
-from data_processor import process_extracted_data
+from backends import BackendUnavailable, load_backend
+from metrics_store import MetricsStore
+from data_processor import merge_processed_data
+from pipeline import process_pdf, stream_process_pdf
+# Cache de extração, estratégia aprendida e pool de processos existem uma vez
+# por processo: são compartilhados por todas as sessões do dashboard e, com
+# "python app.py serve", também pelo agendador
+from services import get_extraction_cache, get_extraction_strategy, get_worker_pool, reports_version
 
 # --- Configuração da API de IA ---
 # Para usar a API, você precisa de uma chave.
@@ -24,16 +30,108 @@ from data_processor import process_extracted_data
 # 💡 ATUALIZE o valor abaixo com a sua chave da API do Google Gemini.
 GOOGLE_API_KEY = "AIzaSyBn-1G3GFapqouuvG_DV4"
 
-# Configura a API de IA
-if GOOGLE_API_KEY and GOOGLE_API_KEY != "SUA_CHAVE_AQUI":
-    genai.configure(api_key=GOOGLE_API_KEY)
-else:
+if not GOOGLE_API_KEY or GOOGLE_API_KEY == "SUA_CHAVE_AQUI":
     st.warning("A chave da API da Google não foi configurada. A função de IA não estará disponível.")
-    genai = None # Garante que genai seja None se a chave não for válida
+
+# A biblioteca de IA da Google (modelos Gemini) é importada e configurada só
+# quando o primeiro resumo é pedido, não a cada abertura do dashboard
+@st.cache_resource
+def get_genai():
+    if not GOOGLE_API_KEY or GOOGLE_API_KEY == "SUA_CHAVE_AQUI":
+        return None
+    try:
+        genai = load_backend("genai")
+    except BackendUnavailable as e:
+        print(f"Biblioteca de IA indisponível: {e}")
+        return None
+    genai.configure(api_key=GOOGLE_API_KEY)
+    return genai
+
+
+# Resultados processados ficam em memória entre reruns do Streamlit, indexados
+# pelo hash do conteúdo do arquivo, com tamanho e tempo de vida limitados
+UPLOAD_CACHE_MAX_ENTRIES = 16
+UPLOAD_CACHE_TTL_SECONDS = 60 * 60
+PARTIAL_KPIS_INTERVAL_SECONDS = 0.5
+
+@st.cache_data(max_entries=UPLOAD_CACHE_MAX_ENTRIES, ttl=UPLOAD_CACHE_TTL_SECONDS, show_spinner=False)
+def process_uploaded_pdf(file_hash, _file_buffer):
+    # Parâmetros com "_" não entram na chave do cache: o hash já identifica o conteúdo.
+    # O PDF é lido direto da memória, sem arquivo temporário no diretório de trabalho
+
+    # KPIs parciais são exibidos enquanto as páginas ainda estão sendo lidas
+    partial_placeholder = st.empty()
+    last_update = [0.0]
+
+    def show_partial_kpis(page_number, page_count, accumulator):
+        now = time.monotonic()
+        if now - last_update[0] < PARTIAL_KPIS_INTERVAL_SECONDS and page_number < page_count:
+            return
+        last_update[0] = now
+        kpis = accumulator.result()["kpis"]
+        partial_placeholder.info(
+            f"Página {page_number} de {page_count}: "
+            f"{kpis.get('Total de Casos de Teste', 0)} casos até agora, "
+            f"{kpis.get('Percentual de Sucesso', 0):.1f}% de sucesso"
+        )
+
+    try:
+        return stream_process_pdf(_file_buffer, cache=get_extraction_cache(), on_progress=show_partial_kpis, strategy=get_extraction_strategy())
+    finally:
+        partial_placeholder.empty()
+
+
+def process_uploaded_batch(uploaded_files):
+    file_hashes = tuple(hashlib.sha256(f.getbuffer()).hexdigest() for f in uploaded_files)
+
+    # Reruns da mesma seleção de arquivos reutilizam o resultado da sessão
+    cached_batch = st.session_state.get("upload_batch")
+    if cached_batch and cached_batch[0] == file_hashes:
+        return cached_batch[1]
+
+    progress = st.progress(0.0, text=f"Processando {len(uploaded_files)} PDFs...")
+    results = {}
+    file_names = [f.name for f in uploaded_files]
+    futures = {}
+    for index, uploaded_file in enumerate(uploaded_files):
+        # O conteúdo vai direto para os processos, sem passar pelo disco
+        future = get_worker_pool().submit(process_pdf, uploaded_file.getvalue(), get_extraction_cache(), strategy=get_extraction_strategy())
+        # Nomes repetidos recebem a posição na seleção para não se sobreporem
+        if file_names.count(uploaded_file.name) > 1:
+            futures[future] = f"{uploaded_file.name} ({index + 1})"
+        else:
+            futures[future] = uploaded_file.name
+
+    for done, future in enumerate(as_completed(futures), start=1):
+        file_name = futures[future]
+        try:
+            results[file_name] = future.result()
+        except Exception as e:
+            st.warning(f"Falha ao processar {file_name}: {e}")
+        progress.progress(done / len(futures), text=f"Processado {done} de {len(futures)}: {file_name}")
+    progress.empty()
+
+    # Mantém a ordem em que os arquivos foram selecionados
+    ordered = {name: results[name] for name in futures.values() if name in results}
+    processed_data = merge_processed_data(ordered)
+    st.session_state["upload_batch"] = (file_hashes, processed_data)
+    return processed_data
+
+
+# As tendências leem apenas os agregados diários/semanais mantidos pelo
+# agendador; o resultado é reaproveitado por alguns segundos entre reruns.
+# Quando o agendador roda no mesmo processo, cada relatório gravado muda a
+# versão e a próxima leitura já o inclui
+TRENDS_CACHE_TTL_SECONDS = 60
+
+@st.cache_data(ttl=TRENDS_CACHE_TTL_SECONDS, show_spinner=False)
+def load_trends(period, version):
+    return MetricsStore().rollup(period)
 
 
 # Função para gerar o texto com IA
 def generate_ai_text(df_status, kpis):
+    genai = get_genai()
     if not genai:
         return "Erro: A chave da API de IA não foi configurada."
 
@@ -77,27 +175,32 @@ def main():
     st.title("📊 QA Dashboard - Análise de Métricas de Testes")
     st.markdown("---")
 
+    page = st.sidebar.radio("Página", ["📄 Relatório PDF", "📈 Tendências"])
+    if page == "📈 Tendências":
+        display_trends()
+        return
+
     # Sidebar para upload de arquivo
     st.sidebar.header("📁 Upload de Arquivo PDF")
-    uploaded_file = st.sidebar.file_uploader(
-        "Selecione um arquivo PDF com métricas de QA",
+    uploaded_files = st.sidebar.file_uploader(
+        "Selecione um ou mais arquivos PDF com métricas de QA",
         type=['pdf'],
-        help="Faça upload de um arquivo PDF contendo dados de testes de QA"
+        accept_multiple_files=True,
+        help="Faça upload de arquivos PDF contendo dados de testes de QA; vários arquivos são processados em paralelo"
     )
 
-    if uploaded_file is not None:
-        # Salva o arquivo temporariamente
-        temp_file_path = f"temp_{uploaded_file.name}"
-        with open(temp_file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+    if uploaded_files:
+        if len(uploaded_files) == 1:
+            uploaded_file = uploaded_files[0]
+            # getbuffer() expõe o upload sem copiá-lo
+            file_buffer = uploaded_file.getbuffer()
+            file_hash = hashlib.sha256(file_buffer).hexdigest()
 
-        # Processa o PDF
-        with st.spinner("Extraindo dados do PDF..."):
-            extracted_data = extract_data_from_pdf(temp_file_path)
-            processed_data = process_extracted_data(extracted_data)
-
-        # Limpa o arquivo temporário
-        os.remove(temp_file_path)
+            # Processa o PDF (reruns com o mesmo arquivo reutilizam o resultado)
+            with st.spinner("Extraindo dados do PDF..."):
+                processed_data = process_uploaded_pdf(file_hash, file_buffer)
+        else:
+            processed_data = process_uploaded_batch(uploaded_files)
 
         # Exibe os resultados
         if not processed_data["df_status"].empty:
@@ -193,6 +296,18 @@ def display_dashboard(processed_data):
     st.subheader("📋 Dados Detalhados")
     st.dataframe(df_status, use_container_width=True)
 
+    # Resultado de cada arquivo quando vários PDFs foram enviados juntos
+    per_file = processed_data.get("per_file")
+    if per_file is not None and not per_file.empty:
+        st.subheader("🗂️ Resultados por Arquivo")
+        st.dataframe(per_file, use_container_width=True)
+
+    # Casos de teste individuais, quando o relatório segue o formato do TestLink
+    grouped_data = processed_data.get("grouped_data")
+    if grouped_data is not None and not grouped_data.empty:
+        st.subheader("🧪 Casos de Teste")
+        st.dataframe(grouped_data, use_container_width=True)
+
     # Funcionalidade de exportação
     st.subheader("💾 Exportar Dados")
     csv = df_status.to_csv(index=False)
@@ -203,6 +318,48 @@ def display_dashboard(processed_data):
         mime="text/csv"
     )
 
+def display_trends():
+    st.header("📈 Tendências dos Relatórios Processados")
+
+    period_label = st.sidebar.selectbox("Agrupar por", ["Dia", "Semana"])
+    df_trends = load_trends("daily" if period_label == "Dia" else "weekly", reports_version())
+
+    if df_trends.empty:
+        st.info("Nenhum relatório processado pelo agendador ainda. Coloque PDFs na pasta input_pdfs/ e execute o agendador.")
+        return
+
+    latest = df_trends.iloc[-1]
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric(label="Relatórios Processados", value=int(df_trends["reports"].sum()))
+    with col2:
+        st.metric(label="Percentual de Execução (último período)", value=f"{latest['percent_execution']:.1f}%")
+    with col3:
+        st.metric(label="Percentual de Sucesso (último período)", value=f"{latest['percent_success']:.1f}%")
+
+    fig_rates = px.line(
+        df_trends,
+        x='period',
+        y=['percent_success', 'percent_execution'],
+        title="Percentual de Sucesso e de Execução",
+        labels={'period': period_label, 'value': 'Percentual (%)', 'variable': 'Métrica'},
+        markers=True
+    )
+    st.plotly_chart(fig_rates, use_container_width=True)
+
+    fig_cases = px.bar(
+        df_trends,
+        x='period',
+        y=['passed_cases', 'executed_cases', 'total_cases'],
+        barmode='group',
+        title="Casos por Período",
+        labels={'period': period_label, 'value': 'Casos', 'variable': 'Métrica'}
+    )
+    st.plotly_chart(fig_cases, use_container_width=True)
+
+    st.subheader("📋 Dados Agregados")
+    st.dataframe(df_trends, use_container_width=True)
+
 def display_sample_dashboard():
     st.header("📊 Dashboard de Exemplo")
     st.info("Este é um exemplo de como o dashboard aparecerá com dados reais.")
@@ -2,65 +2,374 @@ import schedule
 import time
 import os
 import sys
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 import shutil
 
 # Add the src directory to the path so we can import our modules
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from pdf_extractor import extract_data_from_pdf
-from data_processor import process_extracted_data
+from extraction_cache import ExtractionCache, file_sha256
+from extraction_strategy import StrategyStore
+from folder_watcher import FolderWatcher
+from job_queue import JobQueue, mark_started
+from instrumentation import call_collecting_spans, configure, observe_spans, serve_metrics, span
+from metrics_store import MetricsStore
+from pipeline import process_pdf, stream_process_pdf
+
+def process_file(process, pdf_file, pdf_path, job_db=None, **options):
+    """Processes one PDF inside a "file" span; the extraction stages are nested in it.
+
+    With job_db the job is marked as started in that job queue first.
+    """
+    if job_db is not None:
+        mark_started(job_db, pdf_file)
+    with span("file", file=pdf_file):
+        return process(pdf_path, **options)
 
 class QAScheduler:
-    def __init__(self, input_folder="input_pdfs", output_folder="processed_data"):
+    def __init__(self, input_folder="input_pdfs", output_folder="processed_data", workers=1, file_timeout=None, export_csv=False, prescan=False, streaming=False, deduplicate=True, max_attempts=3, cache=None, strategy=None, get_executor=None, on_report_saved=None):
         self.input_folder = input_folder
         self.output_folder = output_folder
         self.processed_folder = os.path.join(input_folder, "processed")
+        # Files that fail max_attempts times (or keep crashing the process)
+        # are moved here so they stop blocking the queue
+        self.quarantine_folder = os.path.join(input_folder, "quarantine")
+        # cache, strategy and the executor can be handed in by a process that
+        # also hosts the dashboard, so both share them
+        self.cache = cache if cache is not None else ExtractionCache()
+        # Learns which table extractor wins for each kind of report
+        self.strategy = strategy if strategy is not None else StrategyStore()
+        # Every report goes into the metrics store; the old per-run CSV
+        # files are only written when export_csv is set
+        self.metrics_store = MetricsStore(os.path.join(output_folder, "qa_metrics.db"))
+        self.export_csv = export_csv
+        # workers > 1 processes PDFs concurrently in a process pool; the
+        # per-file timeout (seconds) only applies in that mode
+        self.workers = workers
+        self.file_timeout = file_timeout
+        # A shared executor, when given (as a function returning it, so a
+        # pool replaced after a crash is picked up), runs every PDF (even a
+        # single one) so the host process stays responsive
+        self.get_executor = get_executor
+        self.on_report_saved = on_report_saved
+        # prescan limits table extraction to the pages that mention results
+        self.prescan = prescan
+        # streaming reads one page at a time, releasing each page's layout
+        # objects, so very long reports are processed in constant memory
+        self.process = stream_process_pdf if streaming else process_pdf
+        # Copies of reports already in the metrics store (same content, any
+        # name) are recorded as aliases without being parsed again
+        self.deduplicate = deduplicate
+        self._file_hashes = {}
+        self._watcher = None
         
         # Create directories if they don't exist
         os.makedirs(self.input_folder, exist_ok=True)
         os.makedirs(self.output_folder, exist_ok=True)
         os.makedirs(self.processed_folder, exist_ok=True)
+        os.makedirs(self.quarantine_folder, exist_ok=True)
+        
+        # Every file goes through a persistent job queue; jobs left running
+        # by a crash are counted as failed attempts when the scheduler starts
+        self.job_queue = JobQueue(os.path.join(output_folder, "qa_jobs.db"), max_attempts=max_attempts)
+        for pdf_file in self.job_queue.recover():
+            print(f"[{datetime.now()}] {pdf_file} interrompeu o processamento {max_attempts} vezes")
+            self._quarantine(pdf_file)
     
-    def process_pdfs(self):
-        """Process all PDFs in the input folder"""
+    def process_pdfs(self, pdf_files=None):
+        """Process the given PDFs, or all PDFs in the input folder"""
         print(f"[{datetime.now()}] Iniciando processamento automático de PDFs...")
         
-        pdf_files = [f for f in os.listdir(self.input_folder) if f.lower().endswith('.pdf')]
+        if pdf_files is None:
+            pdf_files = [f for f in os.listdir(self.input_folder) if f.lower().endswith('.pdf')]
+        else:
+            missing_files = [f for f in pdf_files if not os.path.exists(os.path.join(self.input_folder, f))]
+            for pdf_file in self.job_queue.claim(missing_files):
+                self.job_queue.fail(pdf_file, "arquivo não encontrado", retry=False)
+            pdf_files = [f for f in pdf_files if f not in missing_files]
         
         if not pdf_files:
             print(f"[{datetime.now()}] Nenhum arquivo PDF encontrado na pasta {self.input_folder}")
             return
         
+        # Files waiting for a retry are left alone until their time comes
+        self.job_queue.enqueue(pdf_files)
+        pdf_files = self.job_queue.claim(pdf_files)
+        if not pdf_files:
+            print(f"[{datetime.now()}] Nenhum PDF pronto; próxima tentativa às {self.job_queue.next_retry()}")
+            return
+        
+        try:
+            deferred_files = []
+            if self.deduplicate:
+                pdf_files, deferred_files = self._skip_duplicates(pdf_files)
+            
+            if self.get_executor is not None and pdf_files:
+                self._process_on_executor(pdf_files)
+            elif self.workers > 1 and len(pdf_files) > 1:
+                self._process_concurrently(pdf_files)
+            else:
+                for pdf_file in pdf_files:
+                    try:
+                        pdf_path = os.path.join(self.input_folder, pdf_file)
+                        print(f"[{datetime.now()}] Processando {pdf_file}...")
+                        processed_data = process_file(self.process, pdf_file, pdf_path, cache=self.cache, prescan=self.prescan, strategy=self.strategy)
+                        self._save_results(pdf_file, processed_data)
+                    except Exception as e:
+                        self._job_failed(pdf_file, str(e))
+        except KeyboardInterrupt:
+            # A deliberate stop is not held against the files in flight, nor
+            # against the copies held back for later in this batch
+            for pdf_file in pdf_files + deferred_files:
+                self.job_queue.release(pdf_file)
+            raise
+        finally:
+            # Hashes of files that failed are not kept for the next run
+            self._file_hashes.clear()
+        
+        # Copies of a report from this same batch are checked again now that
+        # the first copy has been recorded (or processed if it failed)
+        if deferred_files:
+            for pdf_file in deferred_files:
+                self.job_queue.release(pdf_file)
+            self.process_pdfs(deferred_files)
+            return
+        
+        print(f"[{datetime.now()}] Processamento automático concluído.")
+    
+    def retry_due_jobs(self):
+        """Processes the files whose retry delay has passed"""
+        due_files = self.job_queue.due()
+        if due_files:
+            self.process_pdfs(due_files)
+    
+    def _job_failed(self, pdf_file, error):
+        print(f"[{datetime.now()}] Erro ao processar {pdf_file}: {error}")
+        if self.job_queue.fail(pdf_file, error):
+            print(f"[{datetime.now()}] {pdf_file} falhou {self.job_queue.max_attempts} vezes")
+            self._quarantine(pdf_file)
+        else:
+            print(f"[{datetime.now()}] Nova tentativa de {pdf_file} a partir de {self.job_queue.next_retry()}")
+    
+    def _quarantine(self, pdf_file):
+        pdf_path = os.path.join(self.input_folder, pdf_file)
+        if not os.path.exists(pdf_path):
+            return
+        quarantine_path = os.path.join(self.quarantine_folder, pdf_file)
+        shutil.move(pdf_path, quarantine_path)
+        print(f"[{datetime.now()}] PDF movido para a quarentena: {quarantine_path}")
+    
+    def _skip_duplicates(self, pdf_files):
+        """Hashes each PDF and records the ones already ingested as aliases.
+        
+        Returns the files to process and the later copies of a file in the
+        same batch, which are held back until the first copy is done.
+        """
+        to_process = []
+        deferred_files = []
+        batch_hashes = set()
         for pdf_file in pdf_files:
-            try:
+            pdf_path = os.path.join(self.input_folder, pdf_file)
+            with span("dedup", file=pdf_file):
+                file_hash = file_sha256(pdf_path)
+                known_report = self.metrics_store.find_report(file_hash)
+            
+            if known_report is not None:
+                report_id, original_file = known_report
+                if original_file == pdf_file:
+                    # Stored by a run that stopped before moving the file
+                    print(f"[{datetime.now()}] {pdf_file} já havia sido gravado antes da interrupção")
+                else:
+                    self.metrics_store.add_alias(report_id, pdf_file, file_hash)
+                    print(f"[{datetime.now()}] {pdf_file} já foi importado como {original_file}; registrado como cópia")
+                self._move_to_processed(pdf_file)
+                self.job_queue.complete(pdf_file)
+            elif file_hash in batch_hashes:
+                deferred_files.append(pdf_file)
+            else:
+                batch_hashes.add(file_hash)
+                self._file_hashes[pdf_file] = file_hash
+                to_process.append(pdf_file)
+        return to_process, deferred_files
+    
+    def _process_concurrently(self, pdf_files):
+        """Process PDFs on a worker pool, saving results in submission order"""
+        # A hung or crashed worker ends the pool; the files that had not
+        # started by then get a fresh pool, without being charged an attempt
+        while pdf_files:
+            unfinished, crashed = self._run_pool(pdf_files)
+            for pdf_file in crashed:
+                unfinished += self._run_pool([pdf_file])[0]
+            if len(unfinished) == len(pdf_files):
+                # Not a single file started: the pool itself is failing
+                for pdf_file in unfinished:
+                    self.job_queue.release(pdf_file)
+                print(f"[{datetime.now()}] Nenhum PDF iniciou no pool de processos; nova tentativa às {self.job_queue.next_retry()}")
+                return
+            pdf_files = unfinished
+    
+    def _run_pool(self, pdf_files):
+        """Runs one pool over pdf_files; returns the files to run again, and
+        the files to run again one at a time (see _run_on_executor)"""
+        print(f"[{datetime.now()}] Processando {len(pdf_files)} PDFs com {self.workers} processos...")
+        # Spawned, not forked: this process may already host tabula's JVM,
+        # which a forked child cannot use. Unlike multiprocessing.Pool, a
+        # worker that dies fails its jobs with BrokenProcessPool instead of
+        # leaving them waiting forever.
+        executor = ProcessPoolExecutor(max_workers=min(self.workers, len(pdf_files)), mp_context=multiprocessing.get_context("spawn"))
+        stalled = True
+        try:
+            unfinished, crashed, stalled = self._run_on_executor(executor, pdf_files)
+        finally:
+            if stalled:
+                # A hung worker (e.g. a stuck tabula JVM) is killed with the
+                # pool; ProcessPoolExecutor has no public way to do that
+                for process in list(executor._processes.values()):
+                    process.terminate()
+            executor.shutdown(wait=not stalled, cancel_futures=True)
+        if unfinished:
+            print(f"[{datetime.now()}] {len(unfinished)} PDFs serão processados novamente em um novo pool")
+        return unfinished, crashed
+    
+    def _process_on_executor(self, pdf_files):
+        """Process PDFs on the shared executor, saving results in submission order"""
+        print(f"[{datetime.now()}] Processando {len(pdf_files)} PDFs no pool de processos compartilhado...")
+        # The pool belongs to the whole process and cannot be terminated, so
+        # the files that did not get to run go back to the job queue without
+        # an attempt; the watcher retries them when idle
+        unfinished, crashed, _ = self._run_on_executor(self.get_executor(), pdf_files)
+        for pdf_file in crashed:
+            unfinished += self._run_on_executor(self.get_executor(), [pdf_file])[0]
+        for pdf_file in unfinished:
+            self.job_queue.release(pdf_file)
+    
+    def _run_on_executor(self, executor, pdf_files):
+        """Runs PDFs on executor, saving results in submission order.
+        
+        Timeouts count from when a worker actually began the job, so the
+        jobs queued behind a hung worker are not charged for its time. A
+        job that times out is charged an attempt, and so is the job that was
+        running when a worker died and broke the pool. When several jobs
+        were running then, there is no telling which one took its worker
+        down, so none is charged; they are returned to be run again one at
+        a time. Returns the files that never started, those crashed files,
+        and whether a worker hung or the pool broke.
+        """
+        jobs = []
+        broken = False
+        try:
+            for pdf_file in pdf_files:
                 pdf_path = os.path.join(self.input_folder, pdf_file)
-                print(f"[{datetime.now()}] Processando {pdf_file}...")
-                
-                # Extract data from PDF
-                extracted_data = extract_data_from_pdf(pdf_path)
-                processed_data = process_extracted_data(extracted_data)
-                
-                # Save processed data as CSV
-                if not processed_data["df_status"].empty:
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    csv_filename = f"qa_metrics_{timestamp}_{pdf_file.replace('.pdf', '.csv')}"
-                    csv_path = os.path.join(self.output_folder, csv_filename)
-                    
-                    processed_data["df_status"].to_csv(csv_path, index=False)
-                    print(f"[{datetime.now()}] Dados salvos em {csv_path}")
-                    
-                    # Move processed PDF to processed folder
-                    processed_pdf_path = os.path.join(self.processed_folder, pdf_file)
-                    shutil.move(pdf_path, processed_pdf_path)
-                    print(f"[{datetime.now()}] PDF movido para {processed_pdf_path}")
+                # Workers send their spans back so the metrics endpoint of
+                # this process covers them too
+                jobs.append((pdf_file, executor.submit(
+                    call_collecting_spans, process_file, self.process, pdf_file, pdf_path,
+                    job_db=self.job_queue.db_path, cache=self.cache, prescan=self.prescan, strategy=self.strategy
+                )))
+        except BrokenProcessPool:
+            broken = True
+        unfinished = pdf_files[len(jobs):]
+        crashed = []
+        
+        worker_hung = False
+        for index, (pdf_file, future) in enumerate(jobs):
+            if future.cancelled():
+                unfinished.append(pdf_file)
+                continue
+            try:
+                processed_data, spans = self._wait_on_executor(pdf_file, future, worker_hung)
+                observe_spans(spans)
+                self._save_results(pdf_file, processed_data)
+            except FutureTimeoutError:
+                future.cancel()
+                if self.job_queue.started_at(pdf_file) is None:
+                    # Never got a worker; its result is discarded if it
+                    # runs later
+                    unfinished.append(pdf_file)
+                    continue
+                worker_hung = True
+                self._job_failed(pdf_file, f"tempo limite de {self.file_timeout}s excedido")
+                # Files still queued behind it are not started any more
+                for _, later_future in jobs[index + 1:]:
+                    later_future.cancel()
+            except BrokenProcessPool as e:
+                # Every job left in a broken pool fails; only the ones a
+                # worker had begun can have caused it
+                broken = True
+                if self.job_queue.started_at(pdf_file) is None:
+                    unfinished.append(pdf_file)
                 else:
-                    print(f"[{datetime.now()}] Erro: Não foi possível extrair dados válidos de {pdf_file}")
-                    
+                    crashed.append(pdf_file)
+                    crash_error = str(e)
             except Exception as e:
-                print(f"[{datetime.now()}] Erro ao processar {pdf_file}: {str(e)}")
+                self._job_failed(pdf_file, str(e))
+        if len(crashed) == 1:
+            self._job_failed(crashed[0], crash_error)
+            crashed = []
+        return unfinished, crashed, worker_hung or broken
+    
+    def _wait_on_executor(self, pdf_file, future, worker_hung):
+        """Waits for a job until file_timeout has passed since it started.
+
+        A job that has not started is waited for indefinitely, unless a
+        worker is known to be hung, in which case it gets file_timeout to
+        start. Raises FutureTimeoutError when the wait runs out.
+        """
+        if self.file_timeout is None:
+            return future.result()
+        waiting_since = time.monotonic()
+        while True:
+            try:
+                return future.result(timeout=min(self.file_timeout, 1.0))
+            except FutureTimeoutError:
+                started_at = self.job_queue.started_at(pdf_file)
+                if started_at is not None:
+                    if (datetime.now() - started_at).total_seconds() >= self.file_timeout:
+                        raise
+                elif worker_hung and time.monotonic() - waiting_since >= self.file_timeout:
+                    raise
+    
+    def _save_results(self, pdf_file, processed_data):
+        """Record the processed data and move the PDF to the processed folder"""
+        pdf_path = os.path.join(self.input_folder, pdf_file)
         
-        print(f"[{datetime.now()}] Processamento automático concluído.")
+        if processed_data["df_status"].empty:
+            raise ValueError("não foi possível extrair dados válidos")
+        
+        processed_at = datetime.now()
+        # The hash taken during deduplication is reused when there is one
+        file_hash = self._file_hashes.pop(pdf_file, None) or file_sha256(pdf_path)
+        with span("store", file=pdf_file):
+            self.metrics_store.add_report(pdf_file, processed_data["df_status"], file_hash=file_hash, processed_at=processed_at)
+        print(f"[{datetime.now()}] Métricas de {pdf_file} gravadas em {self.metrics_store.db_path}")
+        if self.on_report_saved is not None:
+            self.on_report_saved()
+        
+        if self.export_csv:
+            timestamp = processed_at.strftime("%Y%m%d_%H%M%S")
+            csv_filename = f"qa_metrics_{timestamp}_{pdf_file.replace('.pdf', '.csv')}"
+            csv_path = os.path.join(self.output_folder, csv_filename)
+            
+            # Write to a temporary name first so readers never see a partial CSV
+            temp_csv_path = csv_path + ".tmp"
+            with span("csv_write", file=pdf_file):
+                processed_data["df_status"].to_csv(temp_csv_path, index=False)
+                os.replace(temp_csv_path, csv_path)
+            print(f"[{datetime.now()}] Dados salvos em {csv_path}")
+        
+        self._move_to_processed(pdf_file)
+        self.job_queue.complete(pdf_file)
+    
+    def _move_to_processed(self, pdf_file):
+        pdf_path = os.path.join(self.input_folder, pdf_file)
+        processed_pdf_path = os.path.join(self.processed_folder, pdf_file)
+        with span("move", file=pdf_file):
+            shutil.move(pdf_path, processed_pdf_path)
+        print(f"[{datetime.now()}] PDF movido para {processed_pdf_path}")
     
     def start_scheduler(self, schedule_time="09:00"):
         """Start the scheduler to run daily at specified time"""
@@ -70,6 +379,8 @@ class QAScheduler:
         print("Pressione Ctrl+C para parar o agendador")
         
         schedule.every().day.at(schedule_time).do(self.process_pdfs)
+        # Failed files are retried as their backoff expires, not the next day
+        schedule.every().minute.do(self.retry_due_jobs)
         
         try:
             while True:
@@ -78,13 +389,69 @@ class QAScheduler:
         except KeyboardInterrupt:
             print("\nAgendador interrompido pelo usuário.")
 
-if __name__ == "__main__":
-    scheduler = QAScheduler()
+    def watch(self, settle_seconds=1.0, poll_interval=1.0):
+        """Process PDFs as soon as they are dropped into the input folder"""
+        print(f"Monitorando a pasta {os.path.abspath(self.input_folder)}. Novos PDFs serão processados assim que forem copiados.")
+        print(f"Pasta de saída: {os.path.abspath(self.output_folder)}")
+        print("Pressione Ctrl+C para parar o monitoramento")
+        
+        self._watcher = FolderWatcher(self.input_folder, self.process_pdfs, settle_seconds=settle_seconds, poll_interval=poll_interval, on_idle=self.retry_due_jobs)
+        try:
+            self._watcher.run()
+        except KeyboardInterrupt:
+            self._watcher.stop()
+            print("\nMonitoramento interrompido pelo usuário.")
+    
+    def stop(self):
+        """Ends watch() from another thread once the current batch is done"""
+        if self._watcher is not None:
+            self._watcher.stop()
+
+def build_parser(prog=None, combined=False):
+    """Command line options of the scheduler; combined leaves out the run
+    modes, for when the dashboard process hosts the folder watcher"""
+    parser = argparse.ArgumentParser(prog=prog, description="Agendador de processamento automático de PDFs de QA")
+    if not combined:
+        parser.add_argument('--test', action='store_true', help='Processa os PDFs imediatamente e encerra')
+        parser.add_argument('--workers', type=int, default=1, help='Número de PDFs processados em paralelo')
+        parser.add_argument('--watch', action='store_true', help='Processa novos PDFs assim que chegam na pasta de entrada')
+        parser.add_argument('--import-csv', action='store_true', help='Importa os CSVs antigos de processed_data/ para o histórico e encerra')
+    parser.add_argument('--csv', action='store_true', help='Também grava um CSV por relatório em processed_data/')
+    parser.add_argument('--prescan', action='store_true', help='Extrai tabelas apenas das páginas que mencionam o resultado da execução')
+    parser.add_argument('--stream', action='store_true', help='Lê os PDFs página a página, com uso de memória constante')
+    parser.add_argument('--timeout', type=float, default=None, help='Tempo limite em segundos por PDF (com --workers > 1)')
+    parser.add_argument('--max-attempts', type=int, default=3, help='Tentativas por PDF antes de movê-lo para input_pdfs/quarantine/')
+    parser.add_argument('--reprocess', action='store_true', help='Processa também PDFs com conteúdo idêntico a um relatório já importado')
+    parser.add_argument('--spans', metavar='ARQUIVO', help='Grava a duração e a memória de cada etapa em JSON Lines ("-" para a saída padrão)')
+    parser.add_argument('--metrics-port', type=int, default=None, metavar='PORTA', help='Expõe as métricas das etapas no formato Prometheus em http://0.0.0.0:PORTA/metrics')
+    return parser
+
+def create_scheduler(args, **options):
+    """Sets up instrumentation and builds a QAScheduler from parsed options;
+    extra keyword arguments go to QAScheduler as they are"""
+    configure(args.spans)
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+        print(f"Métricas disponíveis em http://0.0.0.0:{args.metrics_port}/metrics")
+    
+    options.setdefault("workers", getattr(args, "workers", 1))
+    return QAScheduler(file_timeout=args.timeout, export_csv=args.csv, prescan=args.prescan, streaming=args.stream, deduplicate=not args.reprocess, max_attempts=args.max_attempts, **options)
+
+def main(argv=None, prog=None):
+    args = build_parser(prog).parse_args(argv)
+    scheduler = create_scheduler(args)
     
     # For testing, process PDFs immediately
-    if len(sys.argv) > 1 and sys.argv[1] == "--test":
+    if args.import_csv:
+        imported = scheduler.metrics_store.import_legacy_csvs(scheduler.output_folder)
+        print(f"{imported} relatórios importados para {scheduler.metrics_store.db_path}")
+    elif args.test:
         scheduler.process_pdfs()
+    elif args.watch:
+        scheduler.watch()
     else:
         # Start the scheduler
         scheduler.start_scheduler()
 
+if __name__ == "__main__":
+    main()
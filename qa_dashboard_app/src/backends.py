@@ -0,0 +1,64 @@
+import importlib
+import importlib.util
+import os
+import shutil
+
+class BackendUnavailable(ImportError):
+    pass
+
+def _java_available():
+    # tabula needs a Java runtime, either on PATH or under a configured home
+    if shutil.which("java"):
+        return True
+    from tabula_backend import DEFAULT_JAVA_HOME
+    for java_home in (os.environ.get("JAVA_HOME"), os.environ.get("QA_JAVA_HOME"), DEFAULT_JAVA_HOME):
+        if java_home and os.path.isdir(os.path.join(java_home, "bin")):
+            return True
+    return False
+
+class Backend:
+    """An optional third-party library, imported the first time it is used.
+
+    check, when given, is a cheap test for what the library needs outside
+    Python (e.g. a Java runtime) so callers can skip a backend that would
+    only fail after paying for its import.
+    """
+
+    def __init__(self, module, install_hint, check=None):
+        self.module = module
+        self.install_hint = install_hint
+        self.check = check
+        self._available = None
+
+    def load(self):
+        try:
+            return importlib.import_module(self.module)
+        except ImportError as e:
+            raise BackendUnavailable(f"{self.module} is not available ({self.install_hint}): {e}") from e
+
+    def available(self):
+        if self._available is None:
+            try:
+                found = importlib.util.find_spec(self.module) is not None
+            except ImportError:
+                found = False
+            self._available = found and (self.check is None or self.check())
+        return self._available
+
+BACKENDS = {
+    "pypdf2": Backend("PyPDF2", "pip install pypdf2"),
+    "pdfplumber": Backend("pdfplumber", "pip install pdfplumber"),
+    "tabula": Backend("tabula", "pip install tabula-py and install Java", check=_java_available),
+    "pillow": Backend("PIL.Image", "pip install Pillow"),
+    "pytesseract": Backend("pytesseract", "pip install pytesseract and install Tesseract OCR"),
+    "pdf2image": Backend("pdf2image", "pip install pdf2image and install poppler-utils"),
+    "genai": Backend("google.generativeai", "pip install google-generativeai")
+}
+
+def load_backend(name):
+    """Imports the backend's module on first use (later calls hit sys.modules)"""
+    return BACKENDS[name].load()
+
+def backend_available(name):
+    """Tells whether a backend can be used, without importing it"""
+    return BACKENDS[name].available()
@@ -0,0 +1,143 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from extraction_cache import ExtractionCache, file_sha256
+from pipeline import process_pdf
+
+FORMATS = ["jsonl", "csv", "parquet"]
+FORMAT_BY_EXTENSION = {".jsonl": "jsonl", ".json": "jsonl", ".csv": "csv", ".parquet": "parquet"}
+
+def find_pdfs(inputs):
+    """Expands directories (their *.pdf files), glob patterns and plain paths, in sorted order"""
+    pdf_paths = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, "*.pdf")) + glob.glob(os.path.join(pattern, "*.PDF"))
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        pdf_paths.update(path for path in matches if os.path.isfile(path) and path.lower().endswith(".pdf"))
+    return sorted(pdf_paths)
+
+def extract_report(pdf_path, use_cache=False, prescan=False):
+    """Extracts one report into a flat record: file, hash, KPIs and totals per status.
+
+    Errors are recorded in the "error" field instead of stopping the batch.
+    The extractors' progress messages go to stderr so stdout stays clean for
+    the results.
+    """
+    record = {"file": pdf_path, "sha256": None, "error": None, "kpis": {}, "status": {}}
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            record["sha256"] = file_sha256(pdf_path)
+            cache = ExtractionCache() if use_cache else None
+            processed_data = process_pdf(pdf_path, cache=cache, prescan=prescan)
+            record["kpis"] = {name: float(value) if isinstance(value, float) else int(value) for name, value in processed_data["kpis"].items()}
+            record["status"] = {str(row.Status): int(row.Total) for row in processed_data["df_status"].itertuples(index=False)}
+            if not record["status"]:
+                record["error"] = "no status data found"
+        except Exception as e:
+            record["error"] = str(e) or type(e).__name__
+    return record
+
+def iter_reports(pdf_paths, jobs=1, use_cache=False, prescan=False):
+    """Yields the records in input order, extracting up to `jobs` PDFs at a time"""
+    if jobs <= 1 or len(pdf_paths) <= 1:
+        for pdf_path in pdf_paths:
+            yield extract_report(pdf_path, use_cache, prescan)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(pdf_paths))) as executor:
+        yield from executor.map(
+            extract_report, pdf_paths, [use_cache] * len(pdf_paths), [prescan] * len(pdf_paths)
+        )
+
+def records_to_frame(records):
+    """One row per report; KPIs and "status_<name>" totals become columns"""
+    rows = []
+    for record in records:
+        row = {"file": record["file"], "sha256": record["sha256"], "error": record["error"]}
+        row.update(record["kpis"])
+        row.update({f"status_{status}": total for status, total in record["status"].items()})
+        rows.append(row)
+    df = pd.DataFrame(rows)
+    status_columns = [column for column in df.columns if column.startswith("status_")]
+    # Statuses missing from a report count as zero
+    df[status_columns] = df[status_columns].fillna(0).astype(int)
+    return df
+
+@contextlib.contextmanager
+def _open_output(output, binary=False):
+    if output == "-":
+        yield sys.stdout.buffer if binary else sys.stdout
+        return
+    with open(output, "wb" if binary else "w", encoding=None if binary else "utf-8", newline=None if binary else "") as file:
+        yield file
+
+def write_reports(records, output="-", output_format="jsonl"):
+    """Writes the records; JSON Lines are written as each report finishes"""
+    count = 0
+    errors = 0
+    if output_format == "jsonl":
+        with _open_output(output) as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                file.flush()
+                count += 1
+                errors += record["error"] is not None
+        return count, errors
+
+    records = list(records)
+    count = len(records)
+    errors = sum(record["error"] is not None for record in records)
+    df = records_to_frame(records)
+    if output_format == "csv":
+        with _open_output(output) as file:
+            df.to_csv(file, index=False)
+    else:
+        # Parquet needs pyarrow (or fastparquet), which is only loaded here
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        with _open_output(output, binary=True) as file:
+            file.write(buffer.getvalue())
+    return count, errors
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="app.py extract",
+        description="Extrai os KPIs de vários relatórios PDF de QA sem iniciar o agendador nem o dashboard"
+    )
+    parser.add_argument('inputs', nargs='+', help='Pastas, arquivos PDF ou padrões glob (ex.: "relatorios/**/*.pdf")')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='Número de PDFs processados em paralelo')
+    parser.add_argument('--output', '-o', default='-', help='Arquivo de saída ("-" para a saída padrão)')
+    parser.add_argument('--format', '-f', choices=FORMATS, default=None, help='Formato de saída (padrão: pela extensão do arquivo, ou jsonl)')
+    parser.add_argument('--cache', action='store_true', help='Reaproveita o cache de extração em cache/extraction')
+    parser.add_argument('--prescan', action='store_true', help='Extrai tabelas apenas das páginas que mencionam o resultado da execução')
+    args = parser.parse_args(argv)
+
+    output_format = args.format or FORMAT_BY_EXTENSION.get(os.path.splitext(args.output)[1].lower(), "jsonl")
+    pdf_paths = find_pdfs(args.inputs)
+    if not pdf_paths:
+        print("Nenhum arquivo PDF encontrado.", file=sys.stderr)
+        return 1
+
+    print(f"Extraindo {len(pdf_paths)} PDFs com {args.jobs} processo(s)...", file=sys.stderr)
+    records = iter_reports(pdf_paths, jobs=args.jobs, use_cache=args.cache, prescan=args.prescan)
+    try:
+        count, errors = write_reports(records, args.output, output_format)
+    except ImportError as e:
+        print(f"Não foi possível gravar {output_format}: {e}", file=sys.stderr)
+        return 2
+
+    print(f"{count} relatórios extraídos, {errors} com erro.", file=sys.stderr)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,75 +1,302 @@
+import re
+
 import pandas as pd
 
-def process_extracted_data(extracted_data):
-    df_status = pd.DataFrame()
-    kpis = {}
-    grouped_data = pd.DataFrame()
+from status_text import iter_status_summaries
 
-    tables = extracted_data["tables"]
-    text_data = extracted_data["text"]
+STATUS_KEYWORDS = ["Passou", "Falhado", "Bloqueado", "Não Executado"]
 
-    status_keywords = ["Passou", "Falhado", "Bloqueado", "Não Executado"]
-    status_counts = {keyword: 0 for keyword in status_keywords}
+# A single case-insensitive pattern finds every status keyword in one pass
+STATUS_KEYWORD_RE = re.compile("|".join(re.escape(keyword) for keyword in STATUS_KEYWORDS), re.IGNORECASE)
+_KEYWORD_BY_LOWER = {keyword.lower(): keyword for keyword in STATUS_KEYWORDS}
 
-    # Try to find status data from tables first
-    for table in tables:
+def count_status_keywords(tables):
+    status_counts = {keyword: 0 for keyword in STATUS_KEYWORDS}
+
+    # Flatten every non-empty text cell of every table into one array
+    cells = pd.Series(
+        [cell for table in tables for row in table for cell in row if isinstance(cell, str) and cell],
+        dtype=object
+    )
+    if cells.empty:
+        return status_counts
+
+    matches = cells.str.findall(STATUS_KEYWORD_RE).explode().dropna()
+    if matches.empty:
+        return status_counts
+
+    # Each keyword counts at most once per cell, as in a per-cell substring test
+    matches = matches.str.lower().map(_KEYWORD_BY_LOWER)
+    matches = matches.reset_index().drop_duplicates()
+    for keyword, total in matches.iloc[:, 1].value_counts().items():
+        status_counts[keyword] = int(total)
+    return status_counts
+
+CASE_COLUMNS = ["Caso de Teste", "Build", "Testador", "Status", "Modo de Execução"]
+
+# TestLink labels of the per-case execution block, normalised (lower case,
+# no trailing colon) and mapped to their column in grouped_data
+CASE_FIELD_LABELS = {
+    "caso de teste": "Caso de Teste",
+    "build": "Build",
+    "testador": "Testador",
+    "resultado da execução": "Status",
+    "modo de execução": "Modo de Execução"
+}
+STEP_STATUS_HEADER = "estado da execução"
+CASE_HEADING_RE = re.compile(r'Caso de Teste\s+([A-Za-z][\w.]*-\d+)\s*:')
+
+def _normalize_label(cell):
+    return " ".join(cell.split()).rstrip(":").strip().lower()
+
+def normalize_status(status):
+    lowered = " ".join(status.split()).lower()
+    if "não executado" in lowered or "nao executado" in lowered:
+        return "Não Executado"
+    if "passou" in lowered:
+        return "Passou"
+    if "falh" in lowered:
+        return "Falhado"
+    if "bloqueado" in lowered:
+        return "Bloqueado"
+    return status.strip()
+
+def _status_from_steps(step_statuses):
+    if "Falhado" in step_statuses:
+        return "Falhado"
+    if "Bloqueado" in step_statuses:
+        return "Bloqueado"
+    if step_statuses and all(status == "Passou" for status in step_statuses):
+        return "Passou"
+    return "Não Executado"
+
+class TestCaseParser:
+    """Builds one record per TestLink test case from the extracted tables.
+
+    A case is made of its step table (with an "Estado da Execução" column)
+    followed by the execution block ("Build", "Testador", "Resultado da
+    Execução", "Modo de Execução"). Tables are fed in document order, so the
+    parser also works on tables that pdfplumber merged together.
+    """
+
+    def __init__(self):
+        self.cases = []
+        self._case = {}
+        self._step_statuses = []
+        self._step_rows = 0
+        self._step_status_col = None
+
+    def feed_table(self, table):
         for row in table:
-            for cell in row:
-                if cell:
-                    for keyword in status_keywords:
-                        if keyword.lower() in cell.lower():
-                            status_counts[keyword] += 1
-
-    # Convert status_counts to a DataFrame
-    if any(status_counts.values()):
-        df_status = pd.DataFrame(list(status_counts.items()), columns=["Status", "Total"])
-        df_status = df_status[df_status["Total"] > 0] # Only include statuses that were found
-    else:
-        # Fallback to previous text-based extraction if no tables found or relevant columns are missing
-        # This part is for the \'example.pdf\' format
-        lines = text_data.split("\n")
-        status_data = []
-        table_header_found = False
-        for line in lines:
-            line = line.strip()
-            if "Status | Total" in line:
-                table_header_found = True
-                continue
-            if table_header_found and line:
-                parts = line.split("|")
-                if len(parts) == 2:
-                    status = parts[0].strip()
-                    try:
-                        total = int(parts[1].strip())
-                        status_data.append([status, total])
-                    except ValueError:
-                        pass # Ignore lines where Total is not a number
-        if status_data:
-            df_status = pd.DataFrame(status_data, columns=["Status", "Total"])
-
-    # Calculate KPIs
-    if not df_status.empty:
-        total_cases = df_status["Total"].sum()
-        passed_cases = df_status[df_status["Status"].str.contains("Passou", case=False)]["Total"].sum()
-        executed_cases = df_status[~df_status["Status"].str.contains("Não Executado", case=False)]["Total"].sum()
-
-        percent_execution = (executed_cases / total_cases) * 100 if total_cases > 0 else 0
-        percent_success = (passed_cases / executed_cases) * 100 if executed_cases > 0 else 0
-
-        kpis = {
-            "Total de Casos de Teste": total_cases,
-            "Casos Passados": passed_cases,
-            "Casos Executados": executed_cases,
-            "Percentual de Execucao": percent_execution,
-            "Percentual de Sucesso": percent_success
-        }
+            self._feed_row(row)
+        # A step column never continues into the next table
+        self._step_status_col = None
+
+    def _feed_row(self, row):
+        cells = [cell if isinstance(cell, str) else "" for cell in row]
+        labels = [_normalize_label(cell) for cell in cells]
+
+        if STEP_STATUS_HEADER in labels:
+            # A new step table starts a new case, even when the previous one
+            # had no execution block (it then counts as "Não Executado" or by
+            # its steps). A lone "Caso de Teste" field names the case ahead.
+            if self._step_rows or set(self._case) - {"Caso de Teste"}:
+                self._close_case()
+            self._step_status_col = labels.index(STEP_STATUS_HEADER)
+            return
+
+        values = [cell.strip() for cell in cells if cell.strip()]
+        if len(values) >= 2 and _normalize_label(values[0]) in CASE_FIELD_LABELS:
+            field = CASE_FIELD_LABELS[_normalize_label(values[0])]
+            # Seeing a field twice means the previous case has ended
+            if field in self._case:
+                self._close_case()
+            value = " ".join(values[1].split())
+            self._case[field] = normalize_status(value) if field == "Status" else value
+            self._step_status_col = None
+            return
+
+        if self._step_status_col is not None and self._step_status_col < len(cells):
+            if values:
+                self._step_rows += 1
+            step_status = cells[self._step_status_col].strip()
+            if step_status:
+                self._step_statuses.append(normalize_status(step_status))
+
+    def _finished_case(self):
+        case = dict(self._case)
+        # Steps without an execution block; none run means "Não Executado"
+        if "Status" not in case and self._step_rows:
+            case["Status"] = _status_from_steps(self._step_statuses)
+        return case if "Status" in case else None
+
+    def _close_case(self):
+        case = self._finished_case()
+        if case is not None:
+            self.cases.append(case)
+        self._case = {}
+        self._step_statuses = []
+        self._step_rows = 0
+
+    def to_frame(self, text_data=""):
+        # The case still being read is included without closing it, so the
+        # frame can be taken while tables are still arriving
+        cases = list(self.cases)
+        pending_case = self._finished_case()
+        if pending_case is not None:
+            cases.append(pending_case)
+        cases = pd.DataFrame(cases, columns=CASE_COLUMNS)
+
+        # Case ids usually live in the "Caso de Teste XX-123:" headings of
+        # the text layer; they are only trusted when they line up one-to-one
+        headings = CASE_HEADING_RE.findall(text_data or "")
+        if len(headings) == len(cases) and cases["Caso de Teste"].isna().all():
+            cases["Caso de Teste"] = headings
+
+        for column in ["Caso de Teste", "Build", "Testador"]:
+            cases[column] = cases[column].astype("string")
+        for column in ["Status", "Modo de Execução"]:
+            cases[column] = cases[column].astype("category")
+        return cases
+
+def parse_test_cases(tables, text_data=""):
+    parser = TestCaseParser()
+    for table in tables:
+        parser.feed_table(table)
+    return parser.to_frame(text_data)
+
+def status_totals(grouped_data):
+    totals = grouped_data.groupby("Status", observed=True).size()
+    # Known statuses first, in the usual order, then anything else found
+    order = [status for status in STATUS_KEYWORDS if status in totals.index]
+    order += [status for status in totals.index if status not in STATUS_KEYWORDS]
+    totals = totals.reindex(order)
+    return pd.DataFrame({"Status": [str(status) for status in totals.index], "Total": totals.to_numpy()})
+
+def calculate_kpis(df_status):
+    if df_status.empty:
+        return {}
+
+    total_cases = df_status["Total"].sum()
+    passed_cases = df_status[df_status["Status"].str.contains("Passou", case=False)]["Total"].sum()
+    executed_cases = df_status[~df_status["Status"].str.contains("Não Executado", case=False)]["Total"].sum()
+
+    percent_execution = (executed_cases / total_cases) * 100 if total_cases > 0 else 0
+    percent_success = (passed_cases / executed_cases) * 100 if executed_cases > 0 else 0
+
+    return {
+        "Total de Casos de Teste": total_cases,
+        "Casos Passados": passed_cases,
+        "Casos Executados": executed_cases,
+        "Percentual de Execucao": percent_execution,
+        "Percentual de Sucesso": percent_success
+    }
+
+def merge_processed_data(processed_by_file):
+    """Combines the results of several reports into one view plus a per-file breakdown"""
+    status_frames = []
+    case_frames = []
+    per_file = []
+    for file_name, processed_data in processed_by_file.items():
+        kpis = processed_data["kpis"]
+        per_file.append({
+            "Arquivo": file_name,
+            "Total de Casos de Teste": kpis.get("Total de Casos de Teste", 0),
+            "Casos Passados": kpis.get("Casos Passados", 0),
+            "Percentual de Execucao": kpis.get("Percentual de Execucao", 0),
+            "Percentual de Sucesso": kpis.get("Percentual de Sucesso", 0)
+        })
+        if not processed_data["df_status"].empty:
+            status_frames.append(processed_data["df_status"])
+        grouped_data = processed_data["grouped_data"]
+        if not grouped_data.empty:
+            case_frames.append(grouped_data.assign(Arquivo=file_name))
+
+    df_status = pd.DataFrame()
+    if status_frames:
+        df_status = pd.concat(status_frames).groupby("Status", sort=False, as_index=False)["Total"].sum()
 
     return {
         "df_status": df_status,
-        "kpis": kpis,
-        "grouped_data": grouped_data # Placeholder for now
+        "kpis": calculate_kpis(df_status),
+        "grouped_data": pd.concat(case_frames, ignore_index=True) if case_frames else pd.DataFrame(),
+        "per_file": pd.DataFrame(per_file)
     }
 
+class StatusAccumulator:
+    """Incremental counterpart of process_extracted_data.
+
+    Tables are added as they are extracted and result() can be called at any
+    point, so status counts and KPIs are available while a long report is
+    still being read and the tables themselves need not be kept.
+    """
+
+    def __init__(self):
+        self._case_parser = TestCaseParser()
+        self._keyword_counts = {keyword: 0 for keyword in STATUS_KEYWORDS}
+        self._summary_totals = {}
+        self.tables_seen = 0
+
+    def _add_summary_table(self, table):
+        # "Status | Total" summary tables already carry the totals
+        header = [_normalize_label(cell) for cell in table[0][:2] if isinstance(cell, str)]
+        if header != ["status", "total"]:
+            return False
+        for row in table[1:]:
+            if len(row) < 2 or not isinstance(row[0], str) or not row[0].strip():
+                continue
+            try:
+                total = int(str(row[1]).strip())
+            except ValueError:
+                continue # Ignore rows where Total is not a number
+            status = row[0].strip()
+            self._summary_totals[status] = self._summary_totals.get(status, 0) + total
+        return True
+
+    def add_tables(self, tables):
+        self.tables_seen += len(tables)
+        tables = [table for table in tables if table and not self._add_summary_table(table)]
+        for table in tables:
+            self._case_parser.feed_table(table)
+        # One vectorised keyword pass per batch of tables
+        for keyword, total in count_status_keywords(tables).items():
+            self._keyword_counts[keyword] += total
+
+    def add_table(self, table):
+        self.add_tables([table])
+
+    def result(self, text_data=""):
+        df_status = pd.DataFrame()
+
+        # Per-case records from the TestLink execution blocks come first
+        grouped_data = self._case_parser.to_frame(text_data)
+        if not grouped_data.empty:
+            df_status = status_totals(grouped_data)
+        # Then summary tables that state the totals per status
+        elif self._summary_totals:
+            df_status = pd.DataFrame(list(self._summary_totals.items()), columns=["Status", "Total"])
+        # Otherwise count status keywords found anywhere in the tables
+        elif any(self._keyword_counts.values()):
+            df_status = pd.DataFrame(list(self._keyword_counts.items()), columns=["Status", "Total"])
+            df_status = df_status[df_status["Total"] > 0] # Only include statuses that were found
+        else:
+            # Fallback to previous text-based extraction if no tables found or relevant columns are missing
+            # This part is for the \'example.pdf\' format
+            status_data = [row for rows in iter_status_summaries(text_data) for row in rows]
+            if status_data:
+                df_status = pd.DataFrame(status_data, columns=["Status", "Total"])
+
+        return {
+            "df_status": df_status,
+            "kpis": calculate_kpis(df_status),
+            "grouped_data": grouped_data
+        }
+
+def process_extracted_data(extracted_data):
+    accumulator = StatusAccumulator()
+    accumulator.add_tables(extracted_data["tables"])
+    return accumulator.result(extracted_data["text"])
+
 if __name__ == "__main__":
     # This part is for testing the data_processor independently
     # You would typically call process_extracted_data from dashboard.py
@@ -98,6 +325,29 @@ if __name__ == "__main__":
     print(processed_data["df_status"])
     print("--- Calculated KPIs ---")
     print(processed_data["kpis"])
+    print("--- Test Cases ---")
+    print(processed_data["grouped_data"])
+
+    # Several cases in a row; the first one has steps but no execution block
+    # and must not be folded into the second
+    steps_header = ["#:", "Ações do Passo:", "Resultados Esperados::", "Estado da\nExecução:"]
+    multi_case_data = {
+        "text": "Caso de Teste QA-1: Login\nCaso de Teste QA-2: Logout\nCaso de Teste QA-3: Busca\n",
+        "tables": [
+            [steps_header, ["1", "Abrir o app", "Tela inicial", "Passou"]],
+            [steps_header, ["1", "Sair", "Tela de login", "Passou"], ["2", "Entrar", "Erro", "Falhado"]],
+            [["Build", "SP49_C1"], ["Testador", "ana"], ["Resultado da Execução:", "Falhado"], ["Modo de Execução:", "Manual"]],
+            [steps_header, ["1", "Buscar", "Resultados", ""]]
+        ],
+        "ocr_text": ""
+    }
+    processed_multi = process_extracted_data(multi_case_data)
+    print("\n--- Test Cases (multiple cases) ---")
+    print(processed_multi["grouped_data"])
+    cases = processed_multi["grouped_data"]
+    assert list(cases["Caso de Teste"]) == ["QA-1", "QA-2", "QA-3"], cases
+    assert list(cases["Status"].astype(str)) == ["Passou", "Falhado", "Não Executado"], cases
+    assert processed_multi["kpis"]["Casos Executados"] == 2, processed_multi["kpis"]
 
     # Test with the original example.pdf format
     print("\n--- Testing with example.pdf format ---")
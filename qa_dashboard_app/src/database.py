@@ -0,0 +1,27 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+
+# The SQLite files of the metrics store, the job queue and the strategy
+# store live with the scheduler's other output
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "processed_data")
+# Report history, shared by MetricsStore and StrategyStore
+DEFAULT_METRICS_DB_PATH = os.path.join(DATA_DIR, "qa_metrics.db")
+
+@contextmanager
+def connect(db_path):
+    """Connection to db_path that commits on success and rolls back on error"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def create_database(db_path, schema):
+    """Creates the folder and the tables of a store that do not exist yet"""
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    with connect(db_path) as conn:
+        # WAL lets the dashboard read while the scheduler is writing
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(schema)
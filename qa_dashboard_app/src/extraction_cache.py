@@ -0,0 +1,253 @@
+import hashlib
+import os
+import pickle
+import struct
+import tempfile
+import zlib
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "extraction")
+DEFAULT_MAX_BYTES = int(os.environ.get("QA_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+CACHE_SUFFIX = ".bin"
+
+# Entries written page by page (see ExtractionCache.writer) start with this
+# header and hold one compressed frame per batch of tables, then a last
+# frame with the text layers. Other entries are a single compressed pickle.
+STREAM_MAGIC = b"QAXSTREAM1\n"
+_FRAME_LENGTH = struct.Struct(">Q")
+
+def _read_frames(file):
+    while True:
+        header = file.read(_FRAME_LENGTH.size)
+        if not header:
+            return
+        if len(header) < _FRAME_LENGTH.size:
+            raise EOFError("truncated frame header")
+        (length,) = _FRAME_LENGTH.unpack(header)
+        frame = file.read(length)
+        if len(frame) < length:
+            raise EOFError("truncated frame")
+        yield pickle.loads(zlib.decompress(frame))
+
+def _check_frames(file):
+    # Walks the frame headers without decompressing the tables; a complete
+    # entry ends exactly after its text frame
+    last_frame = None
+    while True:
+        position = file.tell()
+        header = file.read(_FRAME_LENGTH.size)
+        if not header:
+            break
+        if len(header) < _FRAME_LENGTH.size:
+            raise EOFError("truncated frame header")
+        (length,) = _FRAME_LENGTH.unpack(header)
+        file.seek(length, os.SEEK_CUR)
+        last_frame = position
+    if last_frame is None or file.tell() != os.fstat(file.fileno()).st_size:
+        raise EOFError("truncated entry")
+    file.seek(last_frame)
+    if not isinstance(next(_read_frames(file)), dict):
+        raise EOFError("entry has no text frame")
+
+def _closing(items, file):
+    try:
+        yield from items
+    finally:
+        file.close()
+
+def file_sha256(pdf_path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(pdf_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """Disk cache for extract_data_from_pdf results.
+
+    Entries are keyed by the SHA-256 of the PDF bytes plus the extractor
+    version and options, stored as zlib-compressed pickles and evicted
+    least-recently-used first once the folder grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, content_hash, extractor_version, options=None):
+        options = sorted((options or {}).items())
+        raw_key = f"{content_hash}|{extractor_version}|{options!r}"
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_SUFFIX)
+
+    def get(self, key):
+        entry = self.iter_entry(key)
+        if entry is None:
+            return None
+        extracted_data = {"text": "", "tables": [], "ocr_text": ""}
+        for item in entry:
+            if isinstance(item, dict):
+                extracted_data.update(item)
+            else:
+                extracted_data["tables"].extend(item)
+        return extracted_data
+
+    def iter_entry(self, key):
+        """Reads an entry as batches of tables followed by a dict with the
+        "text" and "ocr_text" layers. Entries written page by page are read
+        one frame at a time, so they can be consumed without holding every
+        table at once. Returns None when there is no usable entry."""
+        entry_path = self._entry_path(key)
+        try:
+            file = open(entry_path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            if file.read(len(STREAM_MAGIC)) == STREAM_MAGIC:
+                _check_frames(file)
+                file.seek(len(STREAM_MAGIC))
+                items = _read_frames(file)
+            else:
+                file.seek(0)
+                extracted_data = pickle.loads(zlib.decompress(file.read()))
+                file.close()
+                items = iter([extracted_data["tables"], {"text": extracted_data["text"], "ocr_text": extracted_data["ocr_text"]}])
+        except Exception as e:
+            file.close()
+            print(f"Discarding unreadable cache entry {entry_path}: {e}")
+            self._remove(entry_path)
+            return None
+
+        # The modification time doubles as the last-used time for eviction
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return _closing(items, file)
+
+    def writer(self, key):
+        """Entry written batch by batch; see CacheEntryWriter"""
+        return CacheEntryWriter(self, key)
+
+    def put(self, key, extracted_data):
+        """Stores an entry. The cache is only an optimization, so a failed
+        write (full disk, read-only folder) is reported and dropped."""
+        payload = zlib.compress(pickle.dumps(extracted_data, protocol=pickle.HIGHEST_PROTOCOL))
+        temp_path = None
+        try:
+            # Write to a private file first so readers never see a partial entry
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as file:
+                file.write(payload)
+            os.replace(temp_path, self._entry_path(key))
+            self._evict()
+        except OSError as e:
+            print(f"Could not write cache entry {self._entry_path(key)}: {e}")
+            if temp_path is not None:
+                self._remove(temp_path)
+
+    def _evict(self):
+        entries = []
+        total_size = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(CACHE_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+
+        entries.sort()
+        for _, size, entry_path in entries:
+            if total_size <= self.max_bytes:
+                break
+            self._remove(entry_path)
+            total_size -= size
+
+    def clear(self):
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(CACHE_SUFFIX):
+                    self._remove(entry.path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class CacheEntryWriter:
+    """Writes a cache entry while the tables are still being extracted.
+
+    Every add_tables() call compresses one frame straight to a private
+    temporary file; commit() adds the text layers and publishes the entry.
+    Leaving the with-block without commit() throws the partial entry away.
+    As with ExtractionCache.put, a write error is reported and the entry
+    dropped; the remaining calls then do nothing.
+    """
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self._temp_path = None
+        self._file = None
+        try:
+            fd, self._temp_path = tempfile.mkstemp(dir=cache.cache_dir, suffix=".tmp")
+            self._file = os.fdopen(fd, 'wb')
+            self._file.write(STREAM_MAGIC)
+        except OSError as e:
+            self._write_failed(e)
+
+    def _write_failed(self, error):
+        print(f"Could not write cache entry {self.cache._entry_path(self.key)}: {error}")
+        self.discard()
+
+    def _write_frame(self, item):
+        frame = zlib.compress(pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL))
+        try:
+            self._file.write(_FRAME_LENGTH.pack(len(frame)))
+            self._file.write(frame)
+        except OSError as e:
+            self._write_failed(e)
+
+    def add_tables(self, tables):
+        if tables and self._temp_path is not None:
+            self._write_frame(tables)
+
+    def commit(self, text, ocr_text=""):
+        if self._temp_path is not None:
+            self._write_frame({"text": text, "ocr_text": ocr_text})
+        # Nothing to publish once a write has failed
+        if self._temp_path is None:
+            return
+        try:
+            self._file.close()
+            os.replace(self._temp_path, self.cache._entry_path(self.key))
+            self._temp_path = None
+            self.cache._evict()
+        except OSError as e:
+            self._write_failed(e)
+
+    def discard(self):
+        if self._temp_path is not None:
+            try:
+                if self._file is not None:
+                    self._file.close()
+            except OSError:
+                # What a failed write left unflushed is thrown away anyway
+                pass
+            self.cache._remove(self._temp_path)
+            self._temp_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.discard()
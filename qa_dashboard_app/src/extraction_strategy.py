@@ -0,0 +1,79 @@
+import math
+import sqlite3
+
+# Kept in the same database as MetricsStore
+from database import DEFAULT_METRICS_DB_PATH, connect, create_database
+
+# Pages sampled to estimate how much text the document's text layer has
+DENSITY_SAMPLE_PAGES = 3
+
+def _density_bucket(chars_per_page):
+    if chars_per_page == 0:
+        return "no-text"
+    if chars_per_page < 200:
+        return "sparse"
+    if chars_per_page < 1500:
+        return "normal"
+    return "dense"
+
+def fingerprint_document(doc):
+    """Groups similar PDFs: same producer, similar size and text-layer density"""
+    try:
+        metadata = doc.reader.metadata or {}
+        producer = str(metadata.get("/Producer") or metadata.get("/Creator") or "unknown")
+    except Exception:
+        producer = "unknown"
+
+    page_count = doc.page_count
+    sample = [doc.page_text(page_num) for page_num in range(min(page_count, DENSITY_SAMPLE_PAGES))]
+    chars_per_page = sum(len(text) for text in sample) / len(sample) if sample else 0
+
+    # Page counts are bucketed by powers of two (1, 2-3, 4-7, ...)
+    size_bucket = int(math.log2(page_count)) if page_count else 0
+    return f"{producer}|pages:{size_bucket}|{_density_bucket(chars_per_page)}"
+
+STRATEGY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extraction_strategies (
+    fingerprint TEXT NOT NULL,
+    method TEXT NOT NULL,
+    wins INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (fingerprint, method)
+);
+"""
+
+class StrategyStore:
+    """Remembers which table extractor won for each kind of PDF.
+
+    For every document fingerprint the store keeps, per extractor, how many
+    times it produced the tables and how long that took. The fastest known
+    winner is tried first the next time a similar PDF comes in. The counts
+    live in the metrics database and every win is a single atomic upsert,
+    so the scheduler, its worker processes and the dashboard all learn from
+    each other without losing concurrent updates.
+    """
+
+    def __init__(self, db_path=DEFAULT_METRICS_DB_PATH):
+        self.db_path = db_path
+        create_database(db_path, STRATEGY_SCHEMA)
+
+    def order(self, fingerprint, default_order):
+        with connect(self.db_path) as conn:
+            rows = conn.execute(
+                "SELECT method, seconds / wins FROM extraction_strategies WHERE fingerprint = ? AND wins > 0", (fingerprint,)
+            ).fetchall()
+        average_seconds = dict(rows)
+        winners = [method for method in default_order if method in average_seconds]
+        winners.sort(key=lambda method: average_seconds[method])
+        return winners + [method for method in default_order if method not in winners]
+
+    def record(self, fingerprint, method, seconds):
+        try:
+            with connect(self.db_path) as conn:
+                conn.execute(
+                    "INSERT INTO extraction_strategies (fingerprint, method, wins, seconds) VALUES (?, ?, 1, ?) "
+                    "ON CONFLICT (fingerprint, method) DO UPDATE SET wins = wins + 1, seconds = seconds + excluded.seconds",
+                    (fingerprint, method, seconds)
+                )
+        except sqlite3.Error as e:
+            print(f"Could not save extraction strategy to {self.db_path}: {e}")
@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+
+class FolderWatcher:
+    """Reports PDFs dropped into a folder as soon as they stop changing.
+
+    With watchdog installed (inotify on Linux) file system events wake the
+    watcher immediately; otherwise the folder is polled every poll_interval
+    seconds. A file is only reported once its size and modification time
+    have stayed the same for settle_seconds, so reports that are still being
+    copied are not picked up half-written. on_idle, if given, is called on
+    every round without new files (e.g. to retry failed work).
+    """
+
+    def __init__(self, folder, on_files, settle_seconds=1.0, poll_interval=1.0, on_idle=None):
+        self.folder = folder
+        self.on_files = on_files
+        self.on_idle = on_idle
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self._pending = {}
+        self._reported = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def run(self):
+        observer = self._start_observer()
+        try:
+            while not self._stop.is_set():
+                ready_files = self._scan()
+                if ready_files:
+                    self.on_files(ready_files)
+                elif self.on_idle is not None:
+                    self.on_idle()
+                # Re-check quickly while files are settling, otherwise wait
+                # for the next event or polling round
+                timeout = self.settle_seconds / 4 if self._pending else self.poll_interval
+                self._wake.wait(timeout)
+                self._wake.clear()
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _start_observer(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            print(f"watchdog não instalado; verificando a pasta {self.folder} a cada {self.poll_interval}s")
+            return None
+
+        wake = self._wake
+
+        class WakeHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wake.set()
+
+        observer = Observer()
+        observer.schedule(WakeHandler(), self.folder, recursive=False)
+        observer.start()
+        return observer
+
+    def _scan(self):
+        now = time.monotonic()
+        seen = set()
+        ready_files = []
+
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if not entry.is_file() or not entry.name.lower().endswith('.pdf'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                seen.add(entry.name)
+                signature = (stat.st_size, stat.st_mtime_ns)
+
+                # Files left in the folder after a failed run are not
+                # reported again until they change
+                if self._reported.get(entry.name) == signature:
+                    continue
+
+                previous = self._pending.get(entry.name)
+                if previous is None or previous[0] != signature:
+                    self._pending[entry.name] = (signature, now)
+                elif now - previous[1] >= self.settle_seconds:
+                    del self._pending[entry.name]
+                    self._reported[entry.name] = signature
+                    ready_files.append(entry.name)
+
+        for name in list(self._pending):
+            if name not in seen:
+                del self._pending[name]
+        for name in list(self._reported):
+            if name not in seen:
+                del self._reported[name]
+
+        return sorted(ready_files)
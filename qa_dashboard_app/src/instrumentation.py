@@ -0,0 +1,190 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# JSON lines file that receives every span ("-" for stdout). Set through the
+# environment so worker processes write to the same file as their parent.
+SPANS_FILE_ENV = "QA_SPANS_FILE"
+
+_current_file = contextvars.ContextVar("qa_span_file", default=None)
+_collected = contextvars.ContextVar("qa_collected_spans", default=None)
+_write_lock = threading.Lock()
+
+def configure(spans_file):
+    """Sends spans of this process and of the worker processes it starts to spans_file"""
+    if spans_file:
+        os.environ[SPANS_FILE_ENV] = spans_file
+    else:
+        os.environ.pop(SPANS_FILE_ENV, None)
+
+def rss_mb():
+    """Current resident memory of this process, when the platform exposes it"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def peak_rss_mb():
+    """Highest resident memory of this process so far. This is a lifetime
+    high-water mark: it only describes one stage when that stage runs in a
+    fresh process (as in benchmark.py)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _emit(record):
+    spans_file = os.environ.get(SPANS_FILE_ENV)
+    if not spans_file:
+        return
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    with _write_lock:
+        try:
+            if spans_file == "-":
+                sys.stdout.write(line)
+                sys.stdout.flush()
+            else:
+                # One short append per span, so several processes can share the file
+                with open(spans_file, "a", encoding="utf-8") as file:
+                    file.write(line)
+        except OSError as e:
+            print(f"Could not write span to {spans_file}: {e}")
+
+@contextmanager
+def span(stage, file=None, **attributes):
+    """Times a stage of the pipeline and records it as one JSON line.
+
+    The yielded dict can be filled with extra attributes (pages, tables...)
+    while the stage runs. Spans opened inside a "file" span inherit its file
+    name. Every finished span also updates the Prometheus counters.
+
+    Memory is recorded as the resident memory when the stage ends
+    (rss_mb), its change over the stage (rss_delta_mb) and the peak of the
+    whole process so far (process_peak_rss_mb), which is not specific to
+    the stage.
+    """
+    token = _current_file.set(file) if file is not None else None
+    record = {
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+        "stage": stage,
+        "file": file if file is not None else _current_file.get(),
+        "pid": os.getpid()
+    }
+    attributes = dict(attributes)
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    try:
+        yield attributes
+        record["status"] = "ok"
+    except BaseException as e:
+        record["status"] = "error"
+        record["error"] = str(e) or type(e).__name__
+        raise
+    finally:
+        record["duration_s"] = round(time.perf_counter() - started, 6)
+        record["rss_mb"] = rss_mb()
+        if record["rss_mb"] is not None and rss_before is not None:
+            record["rss_delta_mb"] = round(record["rss_mb"] - rss_before, 3)
+        record["process_peak_rss_mb"] = peak_rss_mb()
+        record.update(attributes)
+        if token is not None:
+            _current_file.reset(token)
+        observe(record)
+        collected = _collected.get()
+        if collected is not None:
+            collected.append(record)
+        _emit(record)
+
+def call_collecting_spans(func, *args, **kwargs):
+    """Runs func and returns (result, spans recorded meanwhile).
+
+    Used for work sent to pool processes, so the parent can feed the spans
+    of its workers into its own metrics with observe_spans().
+    """
+    spans = []
+    token = _collected.set(spans)
+    try:
+        return func(*args, **kwargs), spans
+    finally:
+        _collected.reset(token)
+
+class StageMetrics:
+    """Running totals per stage, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._peak_rss_mb = 0.0
+
+    def observe(self, record):
+        with self._lock:
+            stats = self._stages.setdefault(record["stage"], {"runs": 0, "errors": 0, "seconds": 0.0, "last_seconds": 0.0, "pages": 0})
+            stats["runs"] += 1
+            stats["errors"] += record.get("status") == "error"
+            stats["seconds"] += record["duration_s"]
+            stats["last_seconds"] = record["duration_s"]
+            stats["pages"] += int(record.get("pages") or 0)
+            if record.get("process_peak_rss_mb"):
+                self._peak_rss_mb = max(self._peak_rss_mb, record["process_peak_rss_mb"])
+
+    def render(self):
+        metrics = [
+            ("qa_stage_runs_total", "counter", "Stage executions", "runs"),
+            ("qa_stage_errors_total", "counter", "Stage executions that raised an error", "errors"),
+            ("qa_stage_seconds_total", "counter", "Total time spent in each stage", "seconds"),
+            ("qa_stage_last_seconds", "gauge", "Duration of the last execution of each stage", "last_seconds"),
+            ("qa_stage_pages_total", "counter", "Pages handled by each stage", "pages")
+        ]
+        with self._lock:
+            lines = []
+            for name, kind, help_text, field in metrics:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for stage, stats in sorted(self._stages.items()):
+                    lines.append(f'{name}{{stage="{stage}"}} {round(stats[field], 6)}')
+            lines.append("# HELP qa_peak_rss_bytes Highest resident memory of any process that ran a stage")
+            lines.append("# TYPE qa_peak_rss_bytes gauge")
+            lines.append(f"qa_peak_rss_bytes {int(self._peak_rss_mb * 1024 * 1024)}")
+        return "\n".join(lines) + "\n"
+
+metrics = StageMetrics()
+
+def observe(record):
+    metrics.observe(record)
+
+def observe_spans(spans):
+    for record in spans:
+        observe(record)
+
+def serve_metrics(port, host="0.0.0.0"):
+    """Serves the stage metrics at http://host:port/metrics from a daemon thread"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would flood the scheduler output
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
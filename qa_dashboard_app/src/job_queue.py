@@ -0,0 +1,213 @@
+import os
+import socket
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from database import DATA_DIR, connect, create_database
+
+DEFAULT_DB_PATH = os.path.join(DATA_DIR, "qa_jobs.db")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_name TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TEXT NOT NULL,
+    last_error TEXT,
+    owner_host TEXT,
+    owner_pid INTEGER,
+    started_at TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+-- At most one queued or running job per file; finished jobs are history
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_file ON jobs (file_name) WHERE state IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, next_attempt_at);
+"""
+
+# Retry delays double after every failed attempt, up to this limit
+MAX_BACKOFF_SECONDS = 3600
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+def _process_alive(pid):
+    if os.name == "nt":
+        # os.kill would terminate the process on Windows
+        import ctypes
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        handle = ctypes.windll.kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class JobQueue:
+    """Persistent record of every PDF the scheduler is working on.
+
+    Each file goes queued -> running -> done. A failed attempt puts the job
+    back in the queue with an exponential backoff; after max_attempts the
+    job is marked failed so the caller can quarantine the file. Every state
+    change is committed before the work it announces, so after a crash the
+    jobs left "running" are exactly the files that were in flight. Running
+    jobs carry the host and pid of the process working on them, so several
+    schedulers can share the queue without recovering each other's jobs.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_attempts=3, backoff_seconds=60):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        create_database(db_path, SCHEMA)
+
+    def _retry_at(self, attempts):
+        delay = min(self.backoff_seconds * 2 ** max(attempts - 1, 0), MAX_BACKOFF_SECONDS)
+        return (datetime.now() + timedelta(seconds=delay)).isoformat(timespec="seconds")
+
+    def recover(self):
+        """Counts the jobs interrupted by a crash as failed attempts.
+
+        Only jobs whose owning process is gone are touched; jobs of another
+        scheduler that is still running (or of another host, which cannot be
+        checked) are left alone. Recovered jobs are retried right away, so a
+        restart picks up where the last run stopped. Returns the files that
+        have now used up their attempts: a file that keeps taking the
+        process down is treated as poison.
+        """
+        poisoned = []
+        host = socket.gethostname()
+        with connect(self.db_path) as conn:
+            rows = conn.execute("SELECT id, file_name, attempts, owner_host, owner_pid FROM jobs WHERE state = ?", (RUNNING,)).fetchall()
+            for job_id, file_name, attempts, owner_host, owner_pid in rows:
+                if owner_pid is not None and (owner_host != host or _process_alive(owner_pid)):
+                    continue
+                poisoned += self._record_failure(
+                    conn, job_id, file_name, attempts + 1, "interrompido (o processo foi encerrado durante o processamento)", retry_at=_now()
+                )
+        return poisoned
+
+    def enqueue(self, file_names):
+        now = _now()
+        with connect(self.db_path) as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (file_name, state, next_attempt_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(file_name, QUEUED, now, now, now) for file_name in file_names]
+            )
+
+    def claim(self, file_names=None):
+        """Marks the queued jobs that are due as running and returns their files"""
+        now = _now()
+        with connect(self.db_path) as conn:
+            rows = conn.execute(
+                "SELECT id, file_name FROM jobs WHERE state = ? AND next_attempt_at <= ? ORDER BY id", (QUEUED, now)
+            ).fetchall()
+            if file_names is not None:
+                wanted = set(file_names)
+                rows = [row for row in rows if row[1] in wanted]
+            conn.executemany(
+                "UPDATE jobs SET state = ?, owner_host = ?, owner_pid = ?, started_at = NULL, updated_at = ? WHERE id = ?",
+                [(RUNNING, socket.gethostname(), os.getpid(), now, job_id) for job_id, _ in rows]
+            )
+        return [file_name for _, file_name in rows]
+
+    def started_at(self, file_name):
+        """When a worker began the running job (see mark_started), or None"""
+        with connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT started_at FROM jobs WHERE file_name = ? AND state = ?", (file_name, RUNNING)
+            ).fetchone()
+        return datetime.fromisoformat(row[0]) if row and row[0] else None
+
+    def release(self, file_name):
+        """Puts a running job back in the queue without counting an attempt"""
+        self._set_state(file_name, QUEUED, next_attempt_at=_now())
+
+    def complete(self, file_name):
+        self._set_state(file_name, DONE)
+
+    def fail(self, file_name, error, retry=True):
+        """Records a failed attempt; returns True when the job is given up on"""
+        with connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT id, attempts FROM jobs WHERE file_name = ? AND state = ?", (file_name, RUNNING)
+            ).fetchone()
+            if row is None:
+                return False
+            job_id, attempts = row
+            # Failures that cannot get better (e.g. the file is gone) use up
+            # every attempt at once
+            attempts = attempts + 1 if retry else self.max_attempts
+            return bool(self._record_failure(conn, job_id, file_name, attempts, error))
+
+    def _record_failure(self, conn, job_id, file_name, attempts, error, retry_at=None):
+        now = _now()
+        if attempts >= self.max_attempts:
+            conn.execute(
+                "UPDATE jobs SET state = ?, attempts = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                (FAILED, attempts, error, now, job_id)
+            )
+            return [file_name]
+        conn.execute(
+            "UPDATE jobs SET state = ?, attempts = ?, last_error = ?, next_attempt_at = ?, updated_at = ? WHERE id = ?",
+            (QUEUED, attempts, error, retry_at or self._retry_at(attempts), now, job_id)
+        )
+        return []
+
+    def _set_state(self, file_name, state, next_attempt_at=None):
+        with connect(self.db_path) as conn:
+            if next_attempt_at is None:
+                conn.execute(
+                    "UPDATE jobs SET state = ?, updated_at = ? WHERE file_name = ? AND state = ?",
+                    (state, _now(), file_name, RUNNING)
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET state = ?, next_attempt_at = ?, updated_at = ? WHERE file_name = ? AND state = ?",
+                    (state, next_attempt_at, _now(), file_name, RUNNING)
+                )
+
+    def due(self):
+        """Files whose queued job may be attempted now"""
+        with connect(self.db_path) as conn:
+            rows = conn.execute(
+                "SELECT file_name FROM jobs WHERE state = ? AND next_attempt_at <= ? ORDER BY id", (QUEUED, _now())
+            ).fetchall()
+        return [file_name for file_name, in rows]
+
+    def next_retry(self):
+        """When the next queued job is due, or None when the queue is empty"""
+        with connect(self.db_path) as conn:
+            row = conn.execute("SELECT MIN(next_attempt_at) FROM jobs WHERE state = ?", (QUEUED,)).fetchone()
+        return datetime.fromisoformat(row[0]) if row and row[0] else None
+
+    def jobs(self, state=None):
+        query = "SELECT * FROM jobs"
+        params = []
+        if state is not None:
+            query += " WHERE state = ?"
+            params.append(state)
+        with connect(self.db_path) as conn:
+            return pd.read_sql_query(query + " ORDER BY id", conn, params=params)
+
+def mark_started(db_path, file_name):
+    """Called by the worker process that begins a running job, so a timeout
+    can be measured from the actual start rather than from submission"""
+    with connect(db_path) as conn:
+        conn.execute(
+            "UPDATE jobs SET started_at = ? WHERE file_name = ? AND state = ?",
+            (datetime.now().isoformat(timespec="milliseconds"), file_name, RUNNING)
+        )
@@ -0,0 +1,228 @@
+import os
+import re
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from data_processor import calculate_kpis
+from database import DEFAULT_METRICS_DB_PATH, connect, create_database
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    processed_at TEXT NOT NULL,
+    report_date TEXT NOT NULL,
+    source_file TEXT NOT NULL,
+    file_hash TEXT,
+    total_cases INTEGER NOT NULL,
+    passed_cases INTEGER NOT NULL,
+    executed_cases INTEGER NOT NULL,
+    percent_execution REAL NOT NULL,
+    percent_success REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reports_date ON reports (report_date);
+CREATE INDEX IF NOT EXISTS idx_reports_hash ON reports (file_hash);
+
+CREATE TABLE IF NOT EXISTS report_status (
+    report_id INTEGER NOT NULL REFERENCES reports (id),
+    report_date TEXT NOT NULL,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_report_status_date ON report_status (report_date, status);
+
+CREATE TABLE IF NOT EXISTS report_aliases (
+    report_id INTEGER NOT NULL REFERENCES reports (id),
+    source_file TEXT NOT NULL,
+    file_hash TEXT NOT NULL,
+    seen_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_report_aliases_hash ON report_aliases (file_hash);
+
+CREATE TABLE IF NOT EXISTS daily_rollup (
+    period TEXT PRIMARY KEY,
+    reports INTEGER NOT NULL,
+    total_cases INTEGER NOT NULL,
+    passed_cases INTEGER NOT NULL,
+    executed_cases INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS weekly_rollup (
+    period TEXT PRIMARY KEY,
+    reports INTEGER NOT NULL,
+    total_cases INTEGER NOT NULL,
+    passed_cases INTEGER NOT NULL,
+    executed_cases INTEGER NOT NULL
+);
+"""
+
+# Rollup tables, keyed by day and by the Monday that starts the week
+ROLLUP_TABLES = {"daily": "daily_rollup", "weekly": "weekly_rollup"}
+
+ROLLUP_UPSERT = """
+INSERT INTO {table} (period, reports, total_cases, passed_cases, executed_cases) VALUES (?, 1, ?, ?, ?)
+ON CONFLICT (period) DO UPDATE SET
+    reports = reports + 1,
+    total_cases = total_cases + excluded.total_cases,
+    passed_cases = passed_cases + excluded.passed_cases,
+    executed_cases = executed_cases + excluded.executed_cases
+"""
+
+LEGACY_CSV_RE = re.compile(r'^qa_metrics_(\d{8}_\d{6})_(.+)\.csv$')
+
+class MetricsStore:
+    """Append-only history of every processed report.
+
+    Each report adds one row to `reports` (KPIs and source file hash) and
+    one row per status to `report_status`, both indexed by report date, in
+    a single SQLite file that the scheduler writes and the dashboard reads.
+    Daily and weekly rollups are updated in the same transaction, so trend
+    queries never have to scan the individual reports. The file hashes also
+    serve as the manifest of everything ingested: copies of a known report
+    are recorded in `report_aliases` instead of being counted again.
+    """
+
+    def __init__(self, db_path=DEFAULT_METRICS_DB_PATH):
+        self.db_path = db_path
+        create_database(db_path, SCHEMA)
+        with connect(db_path) as conn:
+            # Stores created before the rollups existed are backfilled once
+            has_reports = conn.execute("SELECT 1 FROM reports LIMIT 1").fetchone()
+            has_rollup = conn.execute("SELECT 1 FROM daily_rollup LIMIT 1").fetchone()
+            if has_reports and not has_rollup:
+                self._rebuild_rollups(conn)
+
+    def add_report(self, source_file, df_status, file_hash=None, processed_at=None):
+        processed_at = processed_at or datetime.now()
+        report_date = processed_at.date().isoformat()
+        kpis = calculate_kpis(df_status)
+
+        with connect(self.db_path) as conn:
+            cursor = conn.execute(
+                "INSERT INTO reports (processed_at, report_date, source_file, file_hash, total_cases, passed_cases,"
+                " executed_cases, percent_execution, percent_success) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    processed_at.isoformat(timespec="seconds"),
+                    report_date,
+                    source_file,
+                    file_hash,
+                    int(kpis.get("Total de Casos de Teste", 0)),
+                    int(kpis.get("Casos Passados", 0)),
+                    int(kpis.get("Casos Executados", 0)),
+                    float(kpis.get("Percentual de Execucao", 0)),
+                    float(kpis.get("Percentual de Sucesso", 0))
+                )
+            )
+            report_id = cursor.lastrowid
+            self._update_rollups(conn, processed_at.date(), kpis)
+            conn.executemany(
+                "INSERT INTO report_status (report_id, report_date, status, total) VALUES (?, ?, ?, ?)",
+                [(report_id, report_date, str(row.Status), int(row.Total)) for row in df_status.itertuples(index=False)]
+            )
+        return report_id
+
+    def find_report(self, file_hash):
+        """Returns (report_id, source_file) of the first report with this content hash, or None"""
+        with connect(self.db_path) as conn:
+            return conn.execute(
+                "SELECT id, source_file FROM reports WHERE file_hash = ? ORDER BY id LIMIT 1", (file_hash,)
+            ).fetchone()
+
+    def add_alias(self, report_id, source_file, file_hash, seen_at=None):
+        seen_at = seen_at or datetime.now()
+        with connect(self.db_path) as conn:
+            conn.execute(
+                "INSERT INTO report_aliases (report_id, source_file, file_hash, seen_at) VALUES (?, ?, ?, ?)",
+                (report_id, source_file, file_hash, seen_at.isoformat(timespec="seconds"))
+            )
+
+    def aliases(self):
+        with connect(self.db_path) as conn:
+            return pd.read_sql_query(
+                "SELECT a.*, r.source_file AS original_file FROM report_aliases a JOIN reports r ON r.id = a.report_id ORDER BY a.seen_at",
+                conn
+            )
+
+    @staticmethod
+    def _update_rollups(conn, report_date, kpis):
+        totals = (
+            int(kpis.get("Total de Casos de Teste", 0)),
+            int(kpis.get("Casos Passados", 0)),
+            int(kpis.get("Casos Executados", 0))
+        )
+        week_start = report_date - timedelta(days=report_date.weekday())
+        conn.execute(ROLLUP_UPSERT.format(table="daily_rollup"), (report_date.isoformat(),) + totals)
+        conn.execute(ROLLUP_UPSERT.format(table="weekly_rollup"), (week_start.isoformat(),) + totals)
+
+    def _rebuild_rollups(self, conn):
+        conn.execute("DELETE FROM daily_rollup")
+        conn.execute("DELETE FROM weekly_rollup")
+        rows = conn.execute("SELECT report_date, total_cases, passed_cases, executed_cases FROM reports").fetchall()
+        for report_date, total_cases, passed_cases, executed_cases in rows:
+            kpis = {
+                "Total de Casos de Teste": total_cases,
+                "Casos Passados": passed_cases,
+                "Casos Executados": executed_cases
+            }
+            self._update_rollups(conn, date.fromisoformat(report_date), kpis)
+
+    def rollup(self, period="daily", start_date=None, end_date=None):
+        """Returns the pre-aggregated totals and rates per day or per week"""
+        table = ROLLUP_TABLES[period]
+        query, params = self._date_filter(f"SELECT * FROM {table}", start_date, end_date, column="period")
+        with connect(self.db_path) as conn:
+            df_rollup = pd.read_sql_query(query + " ORDER BY period", conn, params=params)
+
+        # Rates are recomputed from the summed counts, not averaged per report
+        total = df_rollup["total_cases"].where(df_rollup["total_cases"] > 0)
+        executed = df_rollup["executed_cases"].where(df_rollup["executed_cases"] > 0)
+        df_rollup["percent_execution"] = (df_rollup["executed_cases"] / total * 100).fillna(0)
+        df_rollup["percent_success"] = (df_rollup["passed_cases"] / executed * 100).fillna(0)
+        df_rollup["period"] = pd.to_datetime(df_rollup["period"])
+        return df_rollup
+
+    def reports(self, start_date=None, end_date=None):
+        query, params = self._date_filter("SELECT * FROM reports", start_date, end_date)
+        with connect(self.db_path) as conn:
+            return pd.read_sql_query(query + " ORDER BY processed_at", conn, params=params)
+
+    def status_totals(self, start_date=None, end_date=None):
+        query, params = self._date_filter("SELECT report_date, status, SUM(total) AS total FROM report_status", start_date, end_date)
+        with connect(self.db_path) as conn:
+            return pd.read_sql_query(query + " GROUP BY report_date, status ORDER BY report_date", conn, params=params)
+
+    @staticmethod
+    def _date_filter(query, start_date, end_date, column="report_date"):
+        conditions = []
+        params = []
+        if start_date is not None:
+            conditions.append(f"{column} >= ?")
+            params.append(str(start_date))
+        if end_date is not None:
+            conditions.append(f"{column} <= ?")
+            params.append(str(end_date))
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return query, params
+
+    def import_legacy_csvs(self, folder):
+        """Loads the per-run qa_metrics_{timestamp}_{name}.csv files into the store"""
+        imported = 0
+        with connect(self.db_path) as conn:
+            known = set(conn.execute("SELECT source_file, processed_at FROM reports"))
+
+        for csv_file in sorted(os.listdir(folder)):
+            match = LEGACY_CSV_RE.match(csv_file)
+            if not match:
+                continue
+            processed_at = datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+            source_file = match.group(2) + ".pdf"
+            if (source_file, processed_at.isoformat(timespec="seconds")) in known:
+                continue
+
+            df_status = pd.read_csv(os.path.join(folder, csv_file))
+            if df_status.empty:
+                continue
+            self.add_report(source_file, df_status, processed_at=processed_at)
+            imported += 1
+        return imported
@@ -1,104 +1,496 @@
 
-import PyPDF2
-import pdfplumber
-import tabula
-from PIL import Image
-import pytesseract
+import hashlib
+import io
+import multiprocessing
 import os
-from pdf2image import convert_from_path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import re
 import sys
+import tempfile
+import time
+from contextlib import contextmanager
 
-def extract_text_from_pdf(pdf_path):
-    text = ""
-    with open(pdf_path, 'rb') as file:
-        reader = PyPDF2.PdfReader(file)
-        for page_num in range(len(reader.pages)):
-            text += reader.pages[page_num].extract_text() or ""
-    return text
+# PDF, OCR and tabula libraries are imported on first use through the
+# backend registry, so importing this module stays cheap
+from backends import backend_available, load_backend
+from extraction_strategy import fingerprint_document
+from instrumentation import span
+from status_text import iter_status_summaries
+import tabula_backend
 
-def extract_tables_from_pdf(pdf_path):
+# Bump whenever a change to the extractors alters their output, so cached
+# results from the previous version are not reused
+EXTRACTOR_VERSION = "2"
+
+# Text-layer markers of the pages that carry execution results in TestLink
+# exports (plus the simple "Status | Total" summary format)
+STATUS_PAGE_RE = re.compile(r'Estado\s+da\s+Execu|Resultado\s+da\s+Execu|Status\s*\|\s*Total', re.IGNORECASE)
+
+def _read_pdf_bytes(pdf):
+    if isinstance(pdf, (str, os.PathLike)):
+        with open(pdf, 'rb') as file:
+            return file.read()
+    if isinstance(pdf, bytes):
+        return pdf
+    if isinstance(pdf, (bytearray, memoryview)):
+        return bytes(pdf)
+    if hasattr(pdf, "read"):
+        return bytes(pdf.read())
+    raise TypeError(f"Expected a PDF path, bytes or a binary file object, got {type(pdf).__name__}")
+
+class PdfDocument:
+    """Parsing session shared by every extractor stage.
+
+    The PDF is given as a path, as bytes (bytes, bytearray or memoryview) or
+    as a binary file object, and is read once; the PyPDF2 reader and the
+    pdfplumber document are built lazily from the same bytes, and the text
+    of each page is cached after its first extraction. `path` is None for
+    documents opened from memory.
+    """
+
+    def __init__(self, pdf):
+        self.path = pdf if isinstance(pdf, (str, os.PathLike)) else None
+        with span("open") as attributes:
+            self.data = _read_pdf_bytes(pdf)
+            attributes["bytes"] = len(self.data)
+        self._reader = None
+        self._plumber = None
+        self._page_text = {}
+        self._sha256 = None
+
+    @property
+    def reader(self):
+        if self._reader is None:
+            self._reader = load_backend("pypdf2").PdfReader(io.BytesIO(self.data))
+        return self._reader
+
+    @property
+    def plumber(self):
+        if self._plumber is None:
+            self._plumber = load_backend("pdfplumber").open(io.BytesIO(self.data))
+        return self._plumber
+
+    @property
+    def sha256(self):
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.data).hexdigest()
+        return self._sha256
+
+    @property
+    def page_count(self):
+        return len(self.reader.pages)
+
+    def page_text(self, page_num):
+        if page_num not in self._page_text:
+            self._page_text[page_num] = self.reader.pages[page_num].extract_text() or ""
+        return self._page_text[page_num]
+
+    def text(self, page_numbers=None):
+        if page_numbers is None:
+            page_numbers = range(self.page_count)
+        return "".join(self.page_text(page_num) for page_num in page_numbers)
+
+    @contextmanager
+    def local_path(self):
+        """Path of the PDF on disk, for backends that only read files (tabula,
+        pdf2image). Documents opened from memory are written to a private
+        temporary file, removed when the block ends."""
+        if self.path is not None:
+            yield self.path
+            return
+        fd, temp_path = tempfile.mkstemp(prefix="qa_pdf_", suffix=".pdf")
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(self.data)
+            yield temp_path
+        finally:
+            os.remove(temp_path)
+
+    def close(self):
+        if self._plumber is not None:
+            self._plumber.close()
+            self._plumber = None
+        self._reader = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def _open_document(pdf):
+    # Accept a path, bytes, a file object or an already open session; only
+    # sessions opened here are closed by the caller
+    if isinstance(pdf, PdfDocument):
+        return pdf, False
+    return PdfDocument(pdf), True
+
+@contextmanager
+def _pdf_on_disk(pdf):
+    # Paths are used as they are, without reading the file
+    if isinstance(pdf, (str, os.PathLike)):
+        yield pdf
+        return
+    doc, owned = _open_document(pdf)
+    try:
+        with doc.local_path() as pdf_path:
+            yield pdf_path
+    finally:
+        if owned:
+            doc.close()
+
+def parse_page_ranges(pages):
+    """Turns "1-3,7" (or an iterable of page numbers), 1-based as in tabula and
+    pdf2image, into a sorted list of 0-based page indexes"""
+    if isinstance(pages, str):
+        page_numbers = set()
+        for part in pages.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            if '-' in part:
+                first, last = part.split('-', 1)
+                page_numbers.update(range(int(first), int(last) + 1))
+            else:
+                page_numbers.add(int(part))
+    else:
+        page_numbers = set(int(page) for page in pages)
+    if any(page < 1 for page in page_numbers):
+        raise ValueError(f"Invalid page range: {pages}")
+    return sorted(page - 1 for page in page_numbers)
+
+def find_candidate_pages(pdf):
+    """Cheap text-layer probe: indexes of the pages that mention execution results"""
+    doc, owned = _open_document(pdf)
+    try:
+        return [page_num for page_num in range(doc.page_count) if STATUS_PAGE_RE.search(doc.page_text(page_num))]
+    finally:
+        if owned:
+            doc.close()
+
+def _page_indexes(doc, pages):
+    """parse_page_ranges limited to the pages the document has; every stage
+    goes through here so they all read the same pages"""
+    page_numbers = [page_num for page_num in parse_page_ranges(pages) if page_num < doc.page_count]
+    if not page_numbers:
+        raise ValueError(f"Page range {pages} is outside the document ({doc.page_count} pages)")
+    return page_numbers
+
+def _select_pages(doc, pages, prescan):
+    # None means every page
+    if pages is not None:
+        return _page_indexes(doc, pages)
+    if prescan:
+        candidates = find_candidate_pages(doc)
+        # Without a usable text layer nothing matches; scan everything instead
+        return candidates or None
+    return None
+
+def extract_text_from_pdf(pdf, pages=None):
+    doc, owned = _open_document(pdf)
+    try:
+        with span("text") as attributes:
+            page_numbers = _page_indexes(doc, pages) if pages is not None else range(doc.page_count)
+            attributes["pages"] = len(page_numbers)
+            return doc.text(page_numbers)
+    finally:
+        if owned:
+            doc.close()
+
+def _clean_table(table):
+    # Filter out empty rows/columns and ensure data integrity
+    cleaned_table = []
+    for row in table:
+        cleaned_row = [cell.replace('\n', ' ') if cell else '' for cell in row]
+        if any(cell.strip() for cell in cleaned_row):
+            cleaned_table.append(cleaned_row)
+    return cleaned_table
+
+def _extract_page_tables(page):
     tables = []
-    
-    # Try with pdfplumber first
+    page_tables = page.extract_tables()
+    if page_tables:
+        for table in page_tables:
+            cleaned_table = _clean_table(table)
+            if cleaned_table:
+                tables.append(cleaned_table)
+    return tables
+
+def _extract_pages_tables(source, page_numbers):
+    # Runs in a worker process: each worker parses the document on its own
+    # (from its path, or from the bytes of an in-memory document) and
+    # returns the tables of the given pages in page order
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    tables = []
+    with load_backend("pdfplumber").open(source) as pdf:
+        for page_num in page_numbers:
+            tables.extend(_extract_page_tables(pdf.pages[page_num]))
+    return tables
+
+# The document a parallel-extraction worker reads, set once per worker by
+# _set_worker_source so in-memory PDFs are not resent with every shard
+_worker_source = None
+
+def _set_worker_source(source):
+    global _worker_source
+    _worker_source = source
+
+def _extract_worker_pages(page_numbers):
+    return _extract_pages_tables(_worker_source, page_numbers)
+
+def _page_shards(page_numbers, workers):
+    # A few shards per worker keeps the pool busy when some pages are much
+    # heavier than others
+    shard_size = max(1, -(-len(page_numbers) // (workers * 4)))
+    return [page_numbers[start:start + shard_size] for start in range(0, len(page_numbers), shard_size)]
+
+def _extract_tables_serial(doc, page_numbers):
+    tables = []
+    for _, page_tables in _iter_page_tables(doc, page_numbers):
+        tables.extend(page_tables)
+    return tables
+
+def _iter_page_tables(doc, page_numbers):
+    for page_num in page_numbers:
+        page = doc.plumber.pages[page_num]
+        page_tables = _extract_page_tables(page)
+        # Drop the page's parsed layout objects once its tables are out
+        page.close()
+        yield page_num, page_tables
+
+def iter_pages(pdf, pages=None, prescan=False):
+    """Yields (page_number, tables) page by page, with 1-based page numbers.
+
+    Only the current page is held in memory, which keeps very long reports
+    at constant memory. Unlike extract_tables_from_pdf there is no tabula or
+    raw-text fallback.
+    """
+    doc, owned = _open_document(pdf)
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                page_tables = page.extract_tables()
-                if page_tables:
-                    for table in page_tables:
-                        # Filter out empty rows/columns and ensure data integrity
-                        cleaned_table = []
-                        for row in table:
-                            cleaned_row = [cell.replace('\n', ' ') if cell else '' for cell in row]
-                            if any(cell.strip() for cell in cleaned_row):
-                                cleaned_table.append(cleaned_row)
-                        if cleaned_table:
-                            tables.append(cleaned_table)
-    except Exception as e:
-        print(f"pdfplumber failed: {e}")
+        selected_pages = _select_pages(doc, pages, prescan)
+        page_numbers = selected_pages if selected_pages is not None else range(doc.page_count)
+        for page_num, page_tables in _iter_page_tables(doc, page_numbers):
+            yield page_num + 1, page_tables
+    finally:
+        if owned:
+            doc.close()
+
+def iter_tables(pdf, pages=None, prescan=False):
+    """Yields the cleaned pdfplumber tables one at a time, in page order"""
+    for _, page_tables in iter_pages(pdf, pages=pages, prescan=prescan):
+        yield from page_tables
+
+def _extract_tables_parallel(doc, page_numbers, workers):
+    shards = _page_shards(page_numbers, workers)
+    if len(shards) <= 1:
+        return _extract_tables_serial(doc, page_numbers)
+
+    # Documents opened from memory are sent to each worker once, as bytes;
+    # the shards then only carry page numbers
+    source = doc.path if doc.path is not None else doc.data
+    tables = []
+    # Spawned, not forked, since tabula may have started a JVM in this process
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards)), mp_context=context, initializer=_set_worker_source, initargs=(source,)) as executor:
+        futures = [executor.submit(_extract_worker_pages, shard) for shard in shards]
+        # Merge in submission order so the result matches the serial path
+        for future in futures:
+            tables.extend(future.result())
+    return tables
+
+# Table extractors by name; each entry is (function, backend it needs).
+# DEFAULT_TABLE_METHODS gives the order they are tried in.
+TABLE_METHODS = {}
+
+def register_table_method(name, backend=None):
+    """Adds a table extractor called as func(doc, selected_pages, parallel, workers)"""
+    def register(func):
+        TABLE_METHODS[name] = (func, backend)
+        return func
+    return register
+
+@register_table_method("pdfplumber", backend="pdfplumber")
+def _tables_with_pdfplumber(doc, selected_pages, parallel, workers):
+    page_numbers = selected_pages if selected_pages is not None else list(range(doc.page_count))
+    if parallel:
+        return _extract_tables_parallel(doc, page_numbers, workers or os.cpu_count() or 1)
+    return _extract_tables_serial(doc, page_numbers)
+
+@register_table_method("tabula", backend="tabula")
+def _tables_with_tabula(doc, selected_pages, parallel, workers):
+    # tabula-py keeps one JVM alive for the whole process
+    tabula_pages = [page_num + 1 for page_num in selected_pages] if selected_pages is not None else 'all'
+    with doc.local_path() as pdf_path:
+        return tabula_backend.read_tables(pdf_path, pages=tabula_pages)
+
+@register_table_method("text", backend="pypdf2")
+def _tables_from_text(doc, selected_pages, parallel, workers):
+    # Parses raw text for simple cases (like our example.pdf), reusing the
+    # page text already extracted by this session
+    tables = []
+    for rows in iter_status_summaries(doc.text(selected_pages)):
+        tables.append([["Status", "Total"]] + [[status, str(total)] for status, total in rows])
+    return tables
+
+DEFAULT_TABLE_METHODS = ["pdfplumber", "tabula", "text"]
 
-    # Fallback to tabula-py if pdfplumber finds no tables or if it fails
-    if not tables:
+def table_method_order(doc, strategy=None, methods=None):
+    """The table extractors to try, in order, and the document fingerprint
+    the order was learned for (None without a strategy store).
+
+    pdfplumber first, then tabula, then raw text (or only the given
+    methods), unless the strategy store knows what usually wins for this
+    kind of document.
+    """
+    methods = methods or DEFAULT_TABLE_METHODS
+    if strategy is None:
+        return methods, None
+    fingerprint = fingerprint_document(doc)
+    return strategy.order(fingerprint, methods), fingerprint
+
+def extract_tables_from_pdf(pdf, parallel=False, workers=None, pages=None, prescan=False, strategy=None, methods=None):
+    doc, owned = _open_document(pdf)
+    try:
+        method_order, fingerprint = table_method_order(doc, strategy, methods)
+        return _extract_tables(doc, method_order, parallel, workers, pages, prescan, strategy, fingerprint)
+    finally:
+        if owned:
+            doc.close()
+
+def _extract_tables(doc, method_order, parallel, workers, pages, prescan, strategy, fingerprint):
+    # Tries the extractors in method_order until one finds tables, and
+    # tells the strategy store which one won
+    tables = []
+
+    # Only explicit pages, or the pages found by the pre-scan, go through
+    # the expensive table extraction
+    selected_pages = _select_pages(doc, pages, prescan)
+
+    page_count = len(selected_pages) if selected_pages is not None else doc.page_count
+    for method in method_order:
+        extractor, backend = TABLE_METHODS[method]
+        # A backend that is not installed (or has no Java runtime) is
+        # skipped without importing anything
+        if backend is not None and not backend_available(backend):
+            continue
+        started = time.perf_counter()
         try:
-            # Ensure Java is in PATH or JAVA_HOME is set for tabula-py
-            os.environ["JAVA_HOME"] = "/usr/lib/jvm/java-17-openjdk-amd64"
-            tables_tabula = tabula.read_pdf(pdf_path, pages='all', multiple_tables=True, stream=True, guess=False, lattice=True)
-            for df in tables_tabula:
-                tables.append(df.values.tolist())
+            # "text" is already the name of the text-layer stage
+            with span("text_tables" if method == "text" else method, pages=page_count) as attributes:
+                tables = extractor(doc, selected_pages, parallel, workers)
+                attributes["tables"] = len(tables)
         except Exception as e:
-            print(f"Tabula-py failed as fallback: {e}")
-
-    # If still no tables, try to parse from raw text for simple cases (like our example.pdf)
-    if not tables:
-        text_data = extract_text_from_pdf(pdf_path)
-        lines = text_data.split('\n')
-        status_data = []
-        table_header_found = False
-        for line in lines:
-            line = line.strip()
-            if re.match(r'Status\s*\|\s*Total', line, re.IGNORECASE):
-                table_header_found = True
-                status_data.append(["Status", "Total"])
-                continue
-            if table_header_found and re.search(r'(\w+)\s*\|\s*(\d+)', line):
-                parts = re.findall(r'(\w+)\s*\|\s*(\d+)', line)
-                for status, total in parts:
-                    status_data.append([status, total])
-            elif table_header_found and not line: 
-                table_header_found = False
-
-        if len(status_data) > 1: 
-            tables.append(status_data)
+            print(f"{method} failed: {e}")
+            tables = []
+        if tables:
+            if strategy is not None:
+                strategy.record(fingerprint, method, time.perf_counter() - started)
+            break
 
     return tables
 
-def ocr_pdf(pdf_path):
-    text = ""
+def _ocr_image_file(image_path):
+    with load_backend("pillow").open(image_path) as image:
+        return load_backend("pytesseract").image_to_string(image)
+
+def _page_runs(page_numbers, batch_size):
+    # Runs of consecutive pages, at most batch_size long, as (first, last)
+    # pairs; pdf2image renders each run in a single call
+    run = []
+    for page_number in page_numbers:
+        if run and (page_number != run[-1] + 1 or len(run) == batch_size):
+            yield run[0], run[-1]
+            run = []
+        run.append(page_number)
+    if run:
+        yield run[0], run[-1]
+
+def iter_ocr_pages(pdf, batch_size=None, workers=None, pages=None):
+    """Yields the OCR text of each page (or of the pages in `pages`), in
+    page order.
+
+    Pages are rendered a batch at a time into a private temporary folder and
+    OCR'd on a thread pool (each tesseract call runs in its own process), so
+    at most one batch of page images exists at any time.
+    """
+    workers = workers or os.cpu_count() or 1
+    batch_size = batch_size or workers
+    pdf2image = load_backend("pdf2image")
+
+    with _pdf_on_disk(pdf) as pdf_path, tempfile.TemporaryDirectory(prefix="qa_ocr_") as output_folder:
+        page_count = pdf2image.pdfinfo_from_path(pdf_path)["Pages"]
+        if pages is not None:
+            page_numbers = [page_num + 1 for page_num in parse_page_ranges(pages) if page_num < page_count]
+        else:
+            page_numbers = range(1, page_count + 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for first_page, last_page in _page_runs(page_numbers, batch_size):
+                image_paths = pdf2image.convert_from_path(
+                    pdf_path,
+                    first_page=first_page,
+                    last_page=last_page,
+                    output_folder=output_folder,
+                    fmt='png',
+                    paths_only=True
+                )
+                for page_text in executor.map(_ocr_image_file, image_paths):
+                    yield page_text
+                for image_path in image_paths:
+                    os.remove(image_path)
+
+def ocr_pdf(pdf, workers=None, pages=None):
+    page_texts = []
     try:
-        images = convert_from_path(pdf_path)
-        for i, image in enumerate(images):
-            image_path = f"page_{i}.png"
-            image.save(image_path, 'PNG')
-            text += pytesseract.image_to_string(Image.open(image_path))
-            os.remove(image_path)
+        with span("ocr") as attributes:
+            for page_text in iter_ocr_pages(pdf, workers=workers, pages=pages):
+                page_texts.append(page_text)
+                attributes["pages"] = len(page_texts)
     except Exception as e:
         print(f"OCR failed: {e}. Ensure poppler-utils is installed and configured correctly.")
-    return text
+    return "".join(page_texts)
 
-def extract_data_from_pdf(pdf_path):
+def extraction_cache_key(cache, doc, pages=None, prescan=False, methods=None):
+    # The extractor order decides whose tables are kept, so an entry made
+    # under one learned order is not served under another
+    options = {
+        "pages": parse_page_ranges(pages) if pages is not None else None,
+        "prescan": prescan,
+        "methods": list(methods or DEFAULT_TABLE_METHODS)
+    }
+    return cache.make_key(doc.sha256, EXTRACTOR_VERSION, options)
+
+def extract_data_from_pdf(pdf, parallel=False, workers=None, cache=None, pages=None, prescan=False, strategy=None, methods=None):
     extracted_data = {
         "text": "",
         "tables": [],
         "ocr_text": ""
     }
 
-    extracted_data["text"] = extract_text_from_pdf(pdf_path)
-    extracted_data["tables"] = extract_tables_from_pdf(pdf_path)
+    # A single parsing session is shared by the text, table and OCR stages
+    doc, owned = _open_document(pdf)
+    try:
+        method_order, fingerprint = table_method_order(doc, strategy, methods)
+        if cache is not None:
+            cache_key = extraction_cache_key(cache, doc, pages=pages, prescan=prescan, methods=method_order)
+            cached_data = cache.get(cache_key)
+            if cached_data is not None:
+                return cached_data
+
+        extracted_data["text"] = extract_text_from_pdf(doc, pages=pages)
+        extracted_data["tables"] = _extract_tables(doc, method_order, parallel, workers, pages, prescan, strategy, fingerprint)
+
+        if not extracted_data["text"] and not extracted_data["tables"]:
+            print("No text or tables found directly. Attempting OCR...")
+            extracted_data["ocr_text"] = ocr_pdf(doc, workers=workers, pages=pages)
+    finally:
+        if owned:
+            doc.close()
 
-    if not extracted_data["text"] and not extracted_data["tables"]:
-        print("No text or tables found directly. Attempting OCR...")
-        extracted_data["ocr_text"] = ocr_pdf(pdf_path)
+    # Empty results are not cached so a later run (e.g. once Tesseract is
+    # installed) gets another chance
+    if cache is not None and any(extracted_data.values()):
+        cache.put(cache_key, extracted_data)
 
     return extracted_data
 
@@ -0,0 +1,81 @@
+import contextlib
+import time
+
+from instrumentation import span
+from pdf_extractor import PdfDocument, extract_data_from_pdf, extract_text_from_pdf, extraction_cache_key, iter_pages, table_method_order
+from data_processor import StatusAccumulator, process_extracted_data
+
+def process_pdf(pdf, cache=None, parallel=False, workers=None, pages=None, prescan=False, strategy=None):
+    """Extracts and processes a single PDF, given as a path, bytes or a file object.
+
+    Kept at module level so it can be sent to worker processes.
+    """
+    extracted_data = extract_data_from_pdf(pdf, parallel=parallel, workers=workers, cache=cache, pages=pages, prescan=prescan, strategy=strategy)
+    with span("processing"):
+        return process_extracted_data(extracted_data)
+
+def stream_process_pdf(pdf, cache=None, pages=None, prescan=False, on_progress=None, strategy=None):
+    """Processes a PDF page by page, updating the status counts as tables arrive.
+
+    on_progress(page_number, page_count, accumulator) is called after every
+    page, so callers can show partial KPIs with accumulator.result(). With a
+    cache, each page's tables are written to the cache entry as they arrive
+    and a cached entry is read back batch by batch, so memory stays flat
+    either way. Reports where pdfplumber finds no tables, or where the
+    strategy store says another extractor usually wins, go through the
+    regular path.
+    """
+    with PdfDocument(pdf) as doc:
+        method_order, fingerprint = table_method_order(doc, strategy)
+        cache_key = None
+        if cache is not None:
+            cache_key = extraction_cache_key(cache, doc, pages=pages, prescan=prescan, methods=method_order)
+            cached_entry = cache.iter_entry(cache_key)
+            if cached_entry is not None:
+                with span("processing", cached=True):
+                    accumulator = StatusAccumulator()
+                    text_data = ""
+                    for item in cached_entry:
+                        if isinstance(item, dict):
+                            text_data = item["text"]
+                        else:
+                            accumulator.add_tables(item)
+                    return accumulator.result(text_data)
+
+        if method_order[0] != "pdfplumber":
+            return process_pdf(doc, cache=cache, pages=pages, prescan=prescan, strategy=strategy)
+
+        started = time.perf_counter()
+        accumulator = StatusAccumulator()
+        cache_writer = cache.writer(cache_key) if cache is not None else contextlib.nullcontext()
+        with cache_writer:
+            # Parsing and counting are interleaved page by page, so this span
+            # covers both
+            with span("pdfplumber", streaming=True) as attributes:
+                for page_number, page_tables in iter_pages(doc, pages=pages, prescan=prescan):
+                    accumulator.add_tables(page_tables)
+                    if cache is not None:
+                        cache_writer.add_tables(page_tables)
+                    if on_progress is not None:
+                        on_progress(page_number, doc.page_count, accumulator)
+                    attributes["pages"] = attributes.get("pages", 0) + 1
+                attributes["tables"] = accumulator.tables_seen
+
+            if accumulator.tables_seen:
+                if strategy is not None:
+                    strategy.record(fingerprint, "pdfplumber", time.perf_counter() - started)
+                text_data = extract_text_from_pdf(doc, pages=pages)
+                if cache is not None:
+                    cache_writer.commit(text_data)
+                with span("processing"):
+                    return accumulator.result(text_data)
+
+        # The open session is reused, so in-memory PDFs are not read twice,
+        # and pdfplumber, which just found nothing on the same pages, is not
+        # run again. The result is what the full method order gives, so it
+        # is cached under that order's key.
+        extracted_data = extract_data_from_pdf(doc, pages=pages, prescan=prescan, strategy=strategy, methods=method_order[1:])
+        if cache is not None and any(extracted_data.values()):
+            cache.put(cache_key, extracted_data)
+        with span("processing"):
+            return process_extracted_data(extracted_data)
@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from extraction_cache import ExtractionCache
+from extraction_strategy import StrategyStore
+
+# One of each per process, created on first use. The dashboard sessions and,
+# when app.py hosts both in one process, the scheduler all share them.
+_lock = threading.Lock()
+_extraction_cache = None
+_extraction_strategy = None
+_worker_pool = None
+_reports_version = 0
+
+def get_extraction_cache():
+    global _extraction_cache
+    with _lock:
+        if _extraction_cache is None:
+            _extraction_cache = ExtractionCache()
+        return _extraction_cache
+
+def get_extraction_strategy():
+    global _extraction_strategy
+    with _lock:
+        if _extraction_strategy is None:
+            _extraction_strategy = StrategyStore()
+        return _extraction_strategy
+
+def _ignore_interrupt():
+    # Ctrl+C reaches the whole process group; only the parent should react,
+    # by shutting the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def get_worker_pool():
+    """Process pool for PDF extraction, sized to the machine"""
+    global _worker_pool
+    with _lock:
+        # A worker that dies abruptly (OOM kill, crash in a native library)
+        # breaks the whole pool for good; the next caller gets a new one
+        if _worker_pool is not None and _worker_pool._broken:
+            _worker_pool.shutdown(wait=False, cancel_futures=True)
+            _worker_pool = None
+        if _worker_pool is None:
+            # Spawned, not forked: the Streamlit server is multithreaded and
+            # may already host tabula's JVM, which a forked child cannot use
+            _worker_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_ignore_interrupt
+            )
+        return _worker_pool
+
+def shutdown_worker_pool():
+    global _worker_pool
+    with _lock:
+        pool, _worker_pool = _worker_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def report_saved():
+    """Called when a report is stored, so readers of the metrics store in this
+    process know their cached trends are out of date"""
+    global _reports_version
+    with _lock:
+        _reports_version += 1
+
+def reports_version():
+    return _reports_version
@@ -0,0 +1,25 @@
+import re
+
+# "Status | Total" summary blocks, as in example.pdf. Rows may sit on their
+# own lines or run together when the text layer drops the line breaks
+# ("Status | TotalPassou | 100Falhou | 10...")
+STATUS_HEADER_RE = re.compile(r'Status[ \t]*\|[ \t]*Total', re.IGNORECASE)
+STATUS_ROW_RE = re.compile(r'[ \t]*\n?[ \t]*([^\W\d][^|\d\n]*?)[ \t]*\|[ \t]*(\d+)')
+
+def iter_status_summaries(text):
+    """Yields the (status, total) rows of every "Status | Total" block in text.
+
+    The header pattern is searched once over the whole text and the rows are
+    matched in place right after it, so the text is never split into lines.
+    """
+    for header in STATUS_HEADER_RE.finditer(text):
+        rows = []
+        position = header.end()
+        while True:
+            row = STATUS_ROW_RE.match(text, position)
+            if not row:
+                break
+            rows.append((row.group(1).strip(), int(row.group(2))))
+            position = row.end()
+        if rows:
+            yield rows
@@ -0,0 +1,151 @@
+import random
+
+from PIL import Image, ImageDraw, ImageFont
+
+# A4 in PDF points
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 36
+ROW_HEIGHT = 16
+FONT_SIZE = 8
+
+STEP_HEADER = ["#:", "Ações do Passo:", "Resultados Esperados::", "Estado da Execução:"]
+STEP_COLUMNS = [MARGIN, MARGIN + 30, MARGIN + 230, MARGIN + 430, PAGE_WIDTH - MARGIN]
+FIELD_COLUMNS = [MARGIN, MARGIN + 160, PAGE_WIDTH - MARGIN]
+CASE_STATUSES = ["Passou", "Falhado", "Bloqueado", "Não Executado"]
+TESTERS = ["ana", "bruno", "carla", "mateus"]
+
+def _case_height(rows):
+    # Heading, step table, gap, execution block, gap
+    return ROW_HEIGHT + (rows + 1) * ROW_HEIGHT + 8 + 4 * ROW_HEIGHT + ROW_HEIGHT
+
+def _table(top, columns, rows):
+    """Lines and cell texts of a ruled table whose top edge is at `top`"""
+    bottom = top + len(rows) * ROW_HEIGHT
+    lines = [(columns[0], top + i * ROW_HEIGHT, columns[-1], top + i * ROW_HEIGHT) for i in range(len(rows) + 1)]
+    lines += [(x, top, x, bottom) for x in columns]
+    texts = []
+    for row_index, row in enumerate(rows):
+        for column_index, cell in enumerate(row):
+            texts.append((columns[column_index] + 3, top + row_index * ROW_HEIGHT + 11, cell))
+    return lines, texts, bottom
+
+def layout_report(pages=10, tables=4, rows=3, seed=0):
+    """Lays out a TestLink-style execution report.
+
+    Every page holds `tables` test cases, each made of a "Caso de Teste" heading,
+    a step table with `rows` steps and the Build/Testador/Resultado block.
+    Returns the per-page (lines, texts) in points from the top-left corner,
+    plus the expected number of cases per status.
+    """
+    if tables * _case_height(rows) > PAGE_HEIGHT - 2 * MARGIN:
+        max_tables = (PAGE_HEIGHT - 2 * MARGIN) // _case_height(rows)
+        raise ValueError(f"At most {max_tables} tables with {rows} rows fit on a page")
+
+    rng = random.Random(seed)
+    expected = {status: 0 for status in CASE_STATUSES}
+    layout = []
+    case_number = 0
+    for _ in range(pages):
+        lines = []
+        texts = []
+        top = MARGIN
+        for _ in range(tables):
+            status = rng.choice(CASE_STATUSES)
+            expected[status] += 1
+            texts.append((MARGIN, top + 11, f"Caso de Teste BM-{case_number}: Cenário sintético {case_number}"))
+
+            step_rows = [STEP_HEADER]
+            for step in range(1, rows + 1):
+                # The last step carries the case's result, the others passed
+                step_status = status if step == rows else "Passou"
+                step_rows.append([str(step), f"Executar passo {step}", "Sistema responde", step_status])
+            table_lines, table_texts, top = _table(top + ROW_HEIGHT, STEP_COLUMNS, step_rows)
+            lines += table_lines
+            texts += table_texts
+
+            field_rows = [
+                ["Build", f"BM_{seed}_C1"],
+                ["Testador", rng.choice(TESTERS)],
+                ["Resultado da Execução:", status],
+                ["Modo de Execução:", "Manual"]
+            ]
+            table_lines, table_texts, top = _table(top + 8, FIELD_COLUMNS, field_rows)
+            lines += table_lines
+            texts += table_texts
+            top += ROW_HEIGHT
+            case_number += 1
+        layout.append((lines, texts))
+    return layout, expected
+
+def _pdf_string(text):
+    encoded = text.encode("cp1252")
+    return b"(" + encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+def _page_content(lines, texts):
+    content = [b"0.5 w"]
+    for x1, y1, x2, y2 in lines:
+        content.append(f"{x1} {PAGE_HEIGHT - y1} m {x2} {PAGE_HEIGHT - y2} l S".encode())
+    for x, y, text in texts:
+        content.append(f"BT /F1 {FONT_SIZE} Tf {x} {PAGE_HEIGHT - y} Td ".encode() + _pdf_string(text) + b" Tj ET")
+    return b"\n".join(content)
+
+def write_text_pdf(path, layout):
+    """Writes the layout as a PDF with a text layer and ruled tables"""
+    page_count = len(layout)
+    # Objects: 1 catalog, 2 page tree, 3 font, then a page and its content
+    # stream for every page
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [" + b" ".join(f"{4 + 2 * i} 0 R".encode() for i in range(page_count))
+        + f"] /Count {page_count} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+    ]
+    for i, (lines, texts) in enumerate(layout):
+        content = _page_content(lines, texts)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        objects.append(f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream")
+
+    with open(path, "wb") as file:
+        file.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(file.tell())
+            file.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+        xref_offset = file.tell()
+        file.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+        for offset in offsets:
+            file.write(f"{offset:010d} 00000 n \n".encode())
+        file.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+def write_scanned_pdf(path, layout, dpi=150):
+    """Writes the layout as page images only, like a scanned report"""
+    scale = dpi / 72
+    try:
+        font = ImageFont.load_default(size=round(FONT_SIZE * scale))
+    except TypeError:
+        # Pillow < 10.1 only has the fixed-size bitmap font
+        font = ImageFont.load_default()
+
+    images = []
+    for lines, texts in layout:
+        image = Image.new("L", (round(PAGE_WIDTH * scale), round(PAGE_HEIGHT * scale)), 255)
+        draw = ImageDraw.Draw(image)
+        for x1, y1, x2, y2 in lines:
+            draw.line([(x1 * scale, y1 * scale), (x2 * scale, y2 * scale)], fill=0, width=1)
+        for x, y, text in texts:
+            draw.text((x * scale, (y - FONT_SIZE) * scale), text, fill=0, font=font)
+        images.append(image)
+    images[0].save(path, "PDF", resolution=dpi, save_all=True, append_images=images[1:])
+
+def generate_report(path, pages=10, tables=4, rows=3, scanned=False, seed=0):
+    """Writes a synthetic TestLink report to path and returns the expected status counts"""
+    layout, expected = layout_report(pages=pages, tables=tables, rows=rows, seed=seed)
+    if scanned:
+        write_scanned_pdf(path, layout)
+    else:
+        write_text_pdf(path, layout)
+    return expected
@@ -0,0 +1,34 @@
+import os
+
+from backends import load_backend
+
+# Used only when neither JAVA_HOME nor QA_JAVA_HOME is configured
+DEFAULT_JAVA_HOME = "/usr/lib/jvm/java-17-openjdk-amd64"
+
+def ensure_java_home():
+    # Only fill JAVA_HOME in when the environment does not provide it
+    if os.environ.get("JAVA_HOME"):
+        return
+    java_home = os.environ.get("QA_JAVA_HOME") or DEFAULT_JAVA_HOME
+    if os.path.isdir(java_home):
+        os.environ["JAVA_HOME"] = java_home
+
+def read_tables(pdf_path, pages='all'):
+    """Reads the tables of a PDF with tabula-py.
+
+    tabula-py (>= 2.8) starts its JVM through jpype on the first call and
+    reuses it for the rest of the process, so JAVA_HOME only has to be right
+    before that first call.
+    """
+    tabula = load_backend("tabula")
+    ensure_java_home()
+    tables_tabula = tabula.read_pdf(
+        pdf_path,
+        pages=pages,
+        multiple_tables=True,
+        stream=True,
+        guess=False,
+        lattice=True,
+        silent=True,
+    )
+    return [df.values.tolist() for df in tables_tabula]